@@ -0,0 +1,36 @@
+"""Helpers for splitting token sequences into model-sized windows"""
+
+from typing import List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def token_windows(length: int, window: int, overlap: int = 0) -> List[Tuple[int, int]]:
+    """Return (start, end) spans covering `length` tokens with a sliding window"""
+    if window <= 0:
+        raise ValueError("window must be positive")
+    if not 0 <= overlap < window:
+        raise ValueError("overlap must be in [0, window)")
+    if length <= 0:
+        return []
+
+    step = window - overlap
+    spans = []
+    start = 0
+    while True:
+        end = min(start + window, length)
+        spans.append((start, end))
+        if end == length:
+            return spans
+        start += step
+
+
+def select_evenly(items: Sequence[T], cap: int) -> List[T]:
+    """Keep at most `cap` items spread evenly across the sequence, preserving order"""
+    if cap <= 0 or len(items) <= cap:
+        return list(items)
+    if cap == 1:
+        return [items[0]]
+    last = len(items) - 1
+    return [items[round(i * last / (cap - 1))] for i in range(cap)]
+
@@ -0,0 +1,117 @@
+"""Persistent, size-bounded LRU cache backed by SQLite"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class DiskLRUCache:
+    def __init__(self, path: str, max_bytes: int, touch_batch: int = 64):
+        """Open (or create) a cache database holding at most `max_bytes` of JSON values
+
+        Access times from hits are written `touch_batch` at a time, or with the
+        next put, rather than committing on every read.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.touch_batch = touch_batch
+        self._lock = threading.Lock()
+        # Access times of hits not yet written back, keyed by cache key
+        self._touched: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent without an fsync per commit; a crash can only lose recent entries
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        # Running byte total, so puts do not sum the table
+        self._total = self._stored_bytes()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._write_touched()
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serialisable value and evict least recently used entries"""
+        data = json.dumps(value)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time())
+            )
+            self._touched.pop(key, None)
+            self._total += size - (replaced[0] if replaced else 0)
+            self._write_touched()
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _write_touched(self):
+        """Write pending access times back so eviction sees recent hits"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        """Delete the oldest entries until the cache fits in max_bytes"""
+        # Recount before deleting: other processes sharing the file also add entries
+        self._total = self._stored_bytes()
+        if self._total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if self._total <= self.max_bytes:
+                break
+            stale.append((key,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, size and hit/miss counters"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            self._total = size
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,20 +1,90 @@
 """Document processing module for OCR and text extraction"""
 
 import os
-from typing import Dict, List
+import contextvars
+import hashlib
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from PIL import Image
 import pytesseract
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-import torch
 import fitz  # PyMuPDF
+from ai.disk_cache import DiskLRUCache
+from ai.ocr import OCRBackend, create_ocr_backend
+from ai.pdf_worker import extract_pages
+from ai.metrics import default_metrics, record_stage
+
+NATIVE_EXTRACTOR_ID = f"pymupdf-{fitz.VersionBind}"
+# Scanned pages are rendered above the 72 dpi default so text lines stay legible
+OCR_DPI = int(os.getenv("OCR_DPI", 150))
+
+PAGES_TOTAL = default_metrics.counter(
+    "greenstamp_pages_total", "Pages whose text was produced, by method", ["method"]
+)
+
+# Called with (page number, page count, "cached" | "text" | "ocr") as each page's text is ready
+PageProgressCallback = Callable[[int, int, str], None]
+
+
+def _ignore_page(page_num: int, method: str):
+    pass
+
+
+def _render_page(page) -> Tuple[int, int, bytes]:
+    """Render a page to raw RGB samples for OCR"""
+    pix = page.get_pixmap(dpi=OCR_DPI)
+    return pix.width, pix.height, pix.samples
+
+
+def _open_document(source: Union[str, bytes], filetype: str = "pdf"):
+    """Open a document from a path or directly from an in-memory buffer
+
+    Pass bytes: PyMuPDF copies a bytearray into a new bytes object first.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype=filetype)
+    return fitz.open(source)
+
+
+def _process_context():
+    """Start workers without forking the server, whose threads and model state a fork would copy"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Workers fork from a server that has loaded only the fitz-only worker module
+        context.set_forkserver_preload(["ai.pdf_worker"])
+        return context
+    return multiprocessing.get_context("spawn")
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, page_cache: Optional[DiskLRUCache] = None, ocr: Optional[OCRBackend] = None):
         """Initialize the document processor with necessary models"""
-        self.processor = TrOCRProcessor.from_pretrained('microsoft/trocr-base-handwritten')
-        self.model = VisionEncoderDecoderModel.from_pretrained('microsoft/trocr-base-handwritten')
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model.to(self.device)
+        # Tesseract for printed pages, TrOCR only for low-confidence pages by default
+        self.ocr = ocr or create_ocr_backend()
+        self.ocr_model_id = self.ocr.model_id
+
+        # Extracted page text keyed on (document hash, page, mode, extractor id)
+        self.page_cache = page_cache or DiskLRUCache(
+            os.getenv("PAGE_CACHE_PATH", "/tmp/greenstamp/pages.sqlite3"),
+            max_bytes=int(os.getenv("PAGE_CACHE_MAX_MB", 1024)) * 1024 * 1024
+        )
+
+        # Page-parallel extraction for long documents
+        self.extract_workers = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+        self.parallel_min_pages = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", 16))
+        # One long-lived worker pool, started on the first parallel extraction
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Scanned pages are rendered and OCRed this many at a time so only one batch of
+        # pixmaps is held in memory, however many pages the report has
+        self.ocr_batch_pages = int(os.getenv("OCR_BATCH_PAGES", 16))
+        # When page progress is reported, OCR runs in batches of this many pages so
+        # progress arrives steadily instead of all at once after one large batch
+        self.ocr_progress_batch = int(os.getenv("OCR_PROGRESS_BATCH", 8))
 
     def process_pdf(self, file_path: str) -> Dict[int, str]:
         """Extract text from PDF using OCR when needed"""
@@ -28,8 +98,8 @@ class DocumentProcessor:
                 
                 # If no text is extracted or text is too short, perform OCR
                 if not text.strip() or len(text) < 100:
-                    pix = page.get_pixmap()
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+                    width, height, samples = _render_page(page)
+                    img = Image.frombytes("RGB", [width, height], samples)
                     text = self._perform_ocr(img)
                 
                 results[page_num] = text
@@ -39,31 +109,193 @@ class DocumentProcessor:
             print(f"Error processing PDF: {str(e)}")
             raise ValueError(f"Failed to process PDF file: {str(e)}")
 
+    def config(self) -> Dict[str, Any]:
+        """Extractors whose output the analysis depends on, used to version cached results"""
+        return {"native": NATIVE_EXTRACTOR_ID, "ocr": self.ocr_model_id, "ocr_dpi": OCR_DPI}
+
+    def _extract_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=_process_context())
+            return self._pool
+
+    def shutdown(self):
+        """Stop the extraction worker processes"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def _perform_ocr(self, image: Image.Image) -> str:
-        """Perform OCR on an image using TrOCR for better accuracy"""
-        pixel_values = self.processor(image, return_tensors="pt").pixel_values.to(self.device)
-        generated_ids = self.model.generate(pixel_values)
-        generated_text = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-        return generated_text
-
-    def extract_text(self, file_path: str) -> Dict[int, str]:
-        """Extract text from a PDF file"""
+        """Perform OCR on an image with the configured OCR backend"""
+        return self.ocr.recognize(image).text
+
+    def extract_text(self, source: Union[str, bytes], doc_hash: Optional[str] = None,
+                     parallel: Optional[bool] = None, filetype: str = "pdf",
+                     progress: Optional[PageProgressCallback] = None) -> Dict[int, str]:
+        """Extract text from a PDF path or in-memory buffer, reusing cached page text"""
         try:
-            doc = fitz.open(file_path)
-            results = {}
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                if text.strip():
-                    results[page_num] = text
+            if doc_hash is None:
+                if isinstance(source, str):
+                    with open(source, "rb") as f:
+                        doc_hash = hashlib.sha256(f.read()).hexdigest()
                 else:
-                    pix = page.get_pixmap()
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    text = self._perform_ocr(img)
-                    results[page_num] = text
+                    doc_hash = hashlib.sha256(source).hexdigest()
+
+            doc = _open_document(source, filetype)
+            page_count = len(doc)
+            results, pending = self._lookup_cached_pages(doc_hash, page_count)
+
+            if progress is None:
+                ocr_batch = self.ocr_batch_pages
+                report = _ignore_page
+            else:
+                ocr_batch = min(self.ocr_batch_pages, self.ocr_progress_batch)
+                report = lambda page_num, method: progress(page_num, page_count, method)
+            PAGES_TOTAL.inc(len(results), method="cached")
+            for page_num in results:
+                report(page_num, "cached")
+
+            if parallel is None:
+                parallel = self.extract_workers > 1 and len(pending) >= self.parallel_min_pages
+
+            if parallel:
+                self._extract_parallel(source, doc, filetype, doc_hash, pending, results, report, ocr_batch)
+            else:
+                scanned = []
+                for page_num in pending:
+                    t0 = time.perf_counter()
+                    page = doc[page_num]
+                    text = page.get_text()
+                    record_stage("extraction_page", time.perf_counter() - t0)
+                    self._store_page(doc_hash, page_num, "text", NATIVE_EXTRACTOR_ID, text)
+                    if text.strip():
+                        results[page_num] = text
+                        PAGES_TOTAL.inc(method="text")
+                        report(page_num, "text")
+                    else:
+                        scanned.append(page_num)
+                        if len(scanned) >= ocr_batch:
+                            results.update(self._ocr_pages(doc, doc_hash, scanned, report, ocr_batch))
+                            scanned = []
+                results.update(self._ocr_pages(doc, doc_hash, scanned, report, ocr_batch))
             
-            return results
+            return dict(sorted(results.items()))
         except Exception as e:
             print(f"Error extracting text: {str(e)}")
             raise ValueError(f"Failed to extract text from file: {str(e)}")
+
+    def _lookup_cached_pages(self, doc_hash: str, page_count: int) -> Tuple[Dict[int, str], List[int]]:
+        """Split pages into cached results and pages that still need extraction"""
+        results = {}
+        pending = []
+        for page_num in range(page_count):
+            # Native text is cached even when empty so scanned pages skip get_text too
+            text = self._cached_page(doc_hash, page_num, "text", NATIVE_EXTRACTOR_ID)
+            if text is not None and not text.strip():
+                text = self._cached_page(doc_hash, page_num, "ocr", self.ocr_model_id)
+            if text is None:
+                pending.append(page_num)
+            else:
+                results[page_num] = text
+        return results, pending
+
+    def _extract_parallel(self, source: Union[str, bytes], doc, filetype: str, doc_hash: str,
+                          pages: List[int], results: Dict[int, str],
+                          report: Callable[[int, str], None] = _ignore_page, ocr_batch: int = 1):
+        """Fan native text extraction out to processes while a single worker runs OCR
+
+        The OCR thread renders scanned pages from doc as it reaches them; nothing else
+        touches doc until extraction finishes.
+        """
+        # Several small groups per worker keep the pool busy when page costs vary
+        group_size = max(1, len(pages) // (self.extract_workers * 4))
+        groups = [pages[i:i + group_size] for i in range(0, len(pages), group_size)]
+
+        # Workers read a report from disk by path; an in-memory upload is placed in shared
+        # memory once rather than pickled into every task or written to a temporary file
+        block = None
+        if isinstance(source, str):
+            path, size = source, None
+        else:
+            block = shared_memory.SharedMemory(create=True, size=max(1, len(source)))
+            block.buf[:len(source)] = source
+            path, size = block.name, len(source)
+
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr") as ocr_worker:
+                pool = self._extract_pool()
+                futures = [pool.submit(extract_pages, path, doc_hash, group, size, filetype) for group in groups]
+                ocr_futures = []
+
+                # OCR starts on the first scanned group while other groups are still extracting
+                for future in as_completed(futures):
+                    scanned = []
+                    for page_num, text, seconds in future.result():
+                        record_stage("extraction_page", seconds)
+                        self._store_page(doc_hash, page_num, "text", NATIVE_EXTRACTOR_ID, text)
+                        if text.strip():
+                            results[page_num] = text
+                            PAGES_TOTAL.inc(method="text")
+                            report(page_num, "text")
+                        else:
+                            scanned.append(page_num)
+                    if scanned:
+                        # Only page numbers wait in the OCR queue; each job renders one batch at a time.
+                        # The OCR thread inherits the caller's context so its timings join the request
+                        ocr_futures.append(ocr_worker.submit(
+                            contextvars.copy_context().run, self._ocr_pages, doc, doc_hash, scanned, report, ocr_batch
+                        ))
+
+                for future in ocr_futures:
+                    results.update(future.result())
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next document
+            with self._pool_lock:
+                self._pool = None
+            raise
+        finally:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    def _ocr_pages(self, doc, doc_hash: str, page_nums: List[int],
+                   report: Callable[[int, str], None] = _ignore_page, batch_size: int = 1) -> Dict[int, str]:
+        """Render and OCR pages batch_size pages per backend call, consulting the page cache first"""
+        results = {}
+        missing = []
+        for page_num in page_nums:
+            text = self._cached_page(doc_hash, page_num, "ocr", self.ocr_model_id)
+            if text is None:
+                missing.append(page_num)
+            else:
+                results[page_num] = text
+                PAGES_TOTAL.inc(method="cached")
+                report(page_num, "cached")
+
+        for batch_start in range(0, len(missing), batch_size):
+            batch = missing[batch_start:batch_start + batch_size]
+            images = []
+            for page_num in batch:
+                width, height, samples = _render_page(doc[page_num])
+                images.append(Image.frombytes("RGB", [width, height], samples))
+            t0 = time.perf_counter()
+            recognized = self.ocr.recognize_many(images)
+            # The backend works on the batch as a whole; each page is charged an equal share
+            page_seconds = (time.perf_counter() - t0) / len(batch)
+            for page_num, result in zip(batch, recognized):
+                record_stage("ocr_page", page_seconds)
+                PAGES_TOTAL.inc(method="ocr")
+                self._store_page(doc_hash, page_num, "ocr", self.ocr_model_id, result.text)
+                results[page_num] = result.text
+                report(page_num, "ocr")
+        return results
+
+    def _page_key(self, doc_hash: str, page_num: int, mode: str, model_id: str) -> str:
+        return f"{doc_hash}:{page_num}:{mode}:{model_id}"
+
+    def _cached_page(self, doc_hash: str, page_num: int, mode: str, model_id: str) -> Optional[str]:
+        return self.page_cache.get(self._page_key(doc_hash, page_num, mode, model_id))
+
+    def _store_page(self, doc_hash: str, page_num: int, mode: str, model_id: str, text: str):
+        self.page_cache.put(self._page_key(doc_hash, page_num, mode, model_id), text)
@@ -0,0 +1,124 @@
+"""Sentence embeddings and an on-disk cosine similarity index"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Tuple
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+from ai.model_registry import ModelRegistry, default_registry
+from ai.metrics import timed
+
+
+def mean_pool(hidden_states: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """Average token embeddings, ignoring padding"""
+    mask = attention_mask.unsqueeze(-1).to(hidden_states.dtype)
+    return (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalise rows so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class SentenceEncoder:
+    """Mean-pooled transformer sentence embeddings, computed in batches"""
+
+    def __init__(self, model_name: str, registry: ModelRegistry = None, batch_size: int = 64,
+                 max_length: int = 128):
+        self.model_name = model_name
+        self.registry = registry or default_registry
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._tokenizer_key = self.registry.register_pretrained(AutoTokenizer, model_name)
+        self._model_key = self.registry.register_pretrained(AutoModel, model_name)
+
+    @property
+    def tokenizer(self):
+        return self.registry.get(self._tokenizer_key)
+
+    @property
+    def model(self):
+        return self.registry.get(self._model_key)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-length embeddings, one row per text"""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="pt")
+            with timed("embedding"), torch.inference_mode():
+                hidden = self.model(**encoded).last_hidden_state
+            vectors.append(mean_pool(hidden, encoded["attention_mask"]).numpy())
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return normalize(np.concatenate(vectors))
+
+
+class EmbeddingIndex:
+    """Labelled unit vectors searched by cosine similarity"""
+
+    def __init__(self, vectors: np.ndarray, labels: List[str], texts: List[str], fingerprint: str = ""):
+        self.vectors = normalize(vectors)
+        self.labels = list(labels)
+        self.texts = list(texts)
+        self.fingerprint = fingerprint
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, queries: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, indices) for each query row, best first"""
+        k = min(k, len(self))
+        if k == 0 or len(queries) == 0:
+            return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+        similarity = normalize(queries) @ self.vectors.T
+        if k < len(self):
+            top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(self)), similarity.shape).copy()
+        scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never sees half an index
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, vectors=self.vectors, labels=np.array(self.labels), texts=np.array(self.texts),
+                 fingerprint=np.array(self.fingerprint))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["vectors"], data["labels"].tolist(), data["texts"].tolist(),
+                       str(data["fingerprint"]))
+
+
+def index_fingerprint(model_name: str, patterns: Dict[str, List[str]]) -> str:
+    """Identifies the encoder and pattern set an index was built from"""
+    payload = json.dumps({"model": model_name, "patterns": patterns}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_or_build_index(path: str, encoder: SentenceEncoder, patterns: Dict[str, List[str]]) -> EmbeddingIndex:
+    """Load the index at path, re-embedding the patterns if it is missing or stale"""
+    fingerprint = index_fingerprint(encoder.model_name, patterns)
+    if os.path.exists(path):
+        try:
+            index = EmbeddingIndex.load(path)
+            if index.fingerprint == fingerprint:
+                return index
+            print(f"Embedding index {path} is stale, rebuilding")
+        except Exception as e:
+            print(f"Error loading embedding index {path}: {str(e)}")
+
+    labels = [label for label, texts in patterns.items() for _ in texts]
+    texts = [text for texts in patterns.values() for text in texts]
+    index = EmbeddingIndex(encoder.encode(texts), labels, texts, fingerprint)
+    index.save(path)
+    print(f"Built embedding index {path} with {len(index)} patterns")
+    return index
@@ -1,96 +1,356 @@
 """ESG analysis module for scoring and categorizing ESG content"""
 
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Tuple
 import numpy as np
 import os
-from transformers import pipeline
-from typing import Dict, List, Any
+import torch
+from transformers import AutoModel, AutoTokenizer
 import re
 from dotenv import load_dotenv
+from ai.chunking import token_windows, select_evenly
+from ai.model_registry import ModelRegistry, default_registry
+from ai.inference_backends import INFERENCE_BACKENDS, file_digest, load_inference_model
+from ai.metrics import timed
+from ai.phrase_matcher import PhraseMatcher, load_lexicon
 
 load_dotenv()
 
+ESG_CATEGORIES = ["environmental", "social", "governance"]
+AGGREGATIONS = ("mean", "max", "weighted")
+
+# Category-specific keywords; ESG_KEYWORDS_PATH can extend them from a JSON lexicon
+ESG_KEYWORDS = {
+    "environmental": [
+        "sustainability",
+        "climate change",
+        "carbon emissions",
+        "greenhouse gases",
+        "renewable energy",
+        "water usage"
+    ],
+    "social": [
+        "diversity",
+        "inclusion",
+        "human rights",
+        "labor practices",
+        "community engagement",
+        "employee welfare"
+    ],
+    "governance": [
+        "corporate governance",
+        "board composition",
+        "executive compensation",
+        "risk management",
+        "compliance",
+        "transparency"
+    ]
+}
+
+
+class ESGClassificationHead(torch.nn.Module):
+    """Sentence-level classification head on top of the shared encoder"""
+
+    def __init__(self, hidden_size: int, num_labels: int = 2, dropout: float = 0.1):
+        super().__init__()
+        self.dense = torch.nn.Linear(hidden_size, hidden_size)
+        self.dropout = torch.nn.Dropout(dropout)
+        self.out_proj = torch.nn.Linear(hidden_size, num_labels)
+
+    def forward(self, features: torch.Tensor) -> torch.Tensor:
+        x = features[:, 0, :]  # <s> token, same as RobertaClassificationHead
+        x = self.dropout(x)
+        x = torch.tanh(self.dense(x))
+        x = self.dropout(x)
+        return self.out_proj(x)
+
+
+class MultiHeadESGClassifier(torch.nn.Module):
+    """One transformer encoder shared by the environmental, social and governance heads"""
+
+    def __init__(self, encoder: torch.nn.Module, categories: List[str], num_labels: int = 2):
+        super().__init__()
+        self.encoder = encoder
+        self.heads = torch.nn.ModuleDict({
+            category: ESGClassificationHead(encoder.config.hidden_size, num_labels)
+            for category in categories
+        })
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Dict[str, torch.Tensor]:
+        hidden_states = self.encoder(input_ids=input_ids, attention_mask=attention_mask)[0]
+        return {category: head(hidden_states) for category, head in self.heads.items()}
+
+
 class ESGAnalyzer:
-    def __init__(self):
+    def __init__(self, model_name: str = "roberta-base", chunk_tokens: int = None,
+                 chunk_overlap: int = None, batch_size: int = None, max_chunks: int = None,
+                 aggregation: str = None, registry: ModelRegistry = None, inference_backend: str = None):
         # Load environment variables
         self.hf_api_key = os.getenv('HUGGINGFACE_API_KEY')
-        
-        # Load specific models for ESG analysis
-        self.environmental_analyzer = pipeline(
-            "text-classification",
-            model="roberta-base",
-            return_all_scores=True,
-            model_kwargs={"cache_dir": "./models/environmental"}
-        )
-        
-        self.social_analyzer = pipeline(
-            "text-classification",
-            model="roberta-base",
-            return_all_scores=True,
-            model_kwargs={"cache_dir": "./models/social"}
-        )
-        
-        self.governance_analyzer = pipeline(
-            "text-classification",
-            model="roberta-base",
-            return_all_scores=True,
-            model_kwargs={"cache_dir": "./models/governance"}
-        )
-        
+
+        # Chunking: documents are scored as token windows rather than truncated at 512 tokens.
+        # max_chunks bounds the number of forward passes, and so CPU latency, per document.
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(os.getenv('ESG_CHUNK_OVERLAP', 64))
+        self.batch_size = batch_size or int(os.getenv('ESG_BATCH_SIZE', 8))
+        # Optional padded-token budget per batch, replacing the fixed batch size
+        self.batch_tokens = int(os.getenv('ESG_BATCH_TOKENS', 0))
+        self.max_chunks = max_chunks or int(os.getenv('ESG_MAX_CHUNKS', 64))
+        self.aggregation = aggregation or os.getenv('ESG_AGGREGATION', 'weighted')
+        if self.aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{self.aggregation}', expected one of {AGGREGATIONS}")
+
+        self._chunk_tokens = chunk_tokens or int(os.getenv('ESG_CHUNK_TOKENS', 0)) or None
+        self._heads_fingerprint = None
+
+        # Keyword lexicon compiled once into a single matcher
+        self.keyword_matcher = PhraseMatcher()
+        for category, phrases in ESG_KEYWORDS.items():
+            self.keyword_matcher.add_many(phrases, category)
+        keywords_path = os.getenv('ESG_KEYWORDS_PATH')
+        if keywords_path:
+            for category, phrases in load_lexicon(keywords_path).items():
+                self.keyword_matcher.add_many(phrases, category)
+
         # Create models directory if it doesn't exist
         os.makedirs("./models", exist_ok=True)
 
+        # Models are loaded through the registry on first use
+        self.model_name = model_name
+        self.registry = registry or default_registry
+        self._tokenizer_key = self.registry.register_pretrained(
+            AutoTokenizer, model_name, cache_dir="./models/shared"
+        )
+
+        # Fine-tuned head weights are optional; without them the heads are freshly
+        # initialised, exactly like the per-category roberta-base pipelines were
+        self.heads_path = os.getenv('ESG_HEADS_PATH')
+        if self.heads_path and not os.path.exists(self.heads_path):
+            print(f"ESG_HEADS_PATH {self.heads_path} does not exist, using untrained heads")
+            self.heads_path = None
+
+        # torch (fp32), int8 (dynamic quantization) or onnx (ONNX Runtime)
+        self.inference_backend = inference_backend or os.getenv('ESG_INFERENCE_BACKEND', 'torch')
+        if self.inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(
+                f"Unknown inference backend '{self.inference_backend}', expected one of {INFERENCE_BACKENDS}"
+            )
+        if self.inference_backend == "onnx" and not self.heads_path:
+            print("ESG heads are untrained; the ONNX export keeps whichever random heads it was exported with")
+        self._model_key = self.registry.register(
+            f"esg-multihead:{model_name}:{self.inference_backend}",
+            lambda: load_inference_model(
+                self.inference_backend, self._load_model, ESG_CATEGORIES,
+                onnx_name=f"esg-multihead-{model_name.replace('/', '--')}",
+                fingerprint=[self.heads_fingerprint]
+            )
+        )
+
+    @property
+    def heads_fingerprint(self) -> str:
+        """Identifies the head weights: a hash of ESG_HEADS_PATH, or "untrained" """
+        if self._heads_fingerprint is None:
+            self._heads_fingerprint = file_digest(self.heads_path) if self.heads_path else "untrained"
+        return self._heads_fingerprint
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the analysis output, used to version cached results"""
+        return {
+            "model": self.model_name,
+            "inference_backend": self.inference_backend,
+            "heads": self.heads_fingerprint,
+            "chunk_tokens": self._chunk_tokens,
+            "chunk_overlap": self.chunk_overlap,
+            "max_chunks": self.max_chunks,
+            "aggregation": self.aggregation,
+            "keywords": self.keyword_matcher.entries()
+        }
+
+    def _load_model(self) -> MultiHeadESGClassifier:
+        # Tokenize and encode each document once; the E/S/G heads share the encoder
+        encoder = AutoModel.from_pretrained(self.model_name, cache_dir="./models/shared", add_pooling_layer=False)
+        model = MultiHeadESGClassifier(encoder, ESG_CATEGORIES)
+        if self.heads_path:
+            model.heads.load_state_dict(torch.load(self.heads_path, map_location="cpu"))
+
+        model.eval()
+        return model
+
+    @property
+    def tokenizer(self):
+        return self.registry.get(self._tokenizer_key)
+
+    @property
+    def model(self):
+        """The scoring model for the configured inference backend"""
+        return self.registry.get(self._model_key)
+
+    @property
+    def chunk_tokens(self) -> int:
+        """Window size in tokens, capped by what the encoder accepts"""
+        max_window = self.tokenizer.model_max_length - self.tokenizer.num_special_tokens_to_add()
+        return min(self._chunk_tokens or max_window, max_window)
+
     def analyze_text(self, text: str) -> Dict[str, Any]:
         try:
-            # Preprocess text
-            processed_text = self._preprocess_text(text)
-
-            # Analyze each category
-            env_results = self.environmental_analyzer(processed_text)[0]
-            soc_results = self.social_analyzer(processed_text)[0]
-            gov_results = self.governance_analyzer(processed_text)[0]
-
-            # Calculate scores
-            env_score = self._calculate_score(env_results)
-            soc_score = self._calculate_score(soc_results)
-            gov_score = self._calculate_score(gov_results)
-
-            # Calculate total score
-            total_score = (env_score + soc_score + gov_score) / 3
-
-            # Generate category details
-            category_details = {
-                "environmental": {
-                    "score": env_score,
-                    "keywords": self._extract_keywords(processed_text, "environmental"),
-                    "confidence": env_results
-                },
-                "social": {
-                    "score": soc_score,
-                    "keywords": self._extract_keywords(processed_text, "social"),
-                    "confidence": soc_results
-                },
-                "governance": {
-                    "score": gov_score,
-                    "keywords": self._extract_keywords(processed_text, "governance"),
-                    "confidence": gov_results
-                }
-            }
-
-            return {
-                "scores": {
-                    "environmental": env_score,
-                    "social": soc_score,
-                    "governance": gov_score,
-                    "total": total_score
-                },
-                "category_details": category_details
-            }
-            
+            return self.analyze_many([text])[0]
         except Exception as e:
             print(f"Error in analysis: {str(e)}")
             raise
 
+    def analyze_many(self, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Score several documents, batching chunks across document boundaries
+
+        Chunks from every document are sorted by length and packed into
+        batches, so each batch pads to similar lengths; the probabilities are
+        then scattered back and reduced per document with segment operations.
+        """
+        # Preprocess text
+        processed_texts = [self._preprocess_text(text) for text in texts]
+        if not processed_texts:
+            return []
+
+        # Chunk every document; each one has at least one chunk, so segments are never empty
+        documents = [self._chunk_document(processed_text) for processed_text in processed_texts]
+        chunks = [chunk for doc_chunks, _ in documents for chunk in doc_chunks]
+        counts = np.array([len(doc_chunks) for doc_chunks, _ in documents])
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        lengths = np.array([max(len(chunk), 1) for chunk in chunks], dtype=np.float64)
+
+        probs: Dict[str, np.ndarray] = {}
+        for batch in self._length_sorted_batches(lengths):
+            for category, batch_probs in self._classify_ids([chunks[i] for i in batch]).items():
+                if category not in probs:
+                    probs[category] = np.empty((len(chunks), batch_probs.shape[1]), dtype=batch_probs.dtype)
+                probs[category][batch] = batch_probs
+
+        aggregated = {
+            category: self._aggregate_segments(category_probs, lengths, starts, counts)
+            for category, category_probs in probs.items()
+        }
+        analyses = []
+        for doc, (processed_text, (_, coverage)) in enumerate(zip(processed_texts, documents)):
+            results = {category: self._to_label_scores(rows[doc]) for category, rows in aggregated.items()}
+            analyses.append(self._build_analysis(processed_text, results, coverage))
+        return analyses
+
+    def _length_sorted_batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Chunk indices grouped into batches of similar length
+
+        Batches hold batch_size chunks or, when ESG_BATCH_TOKENS is set, as
+        many chunks as fit in that many padded tokens.
+        """
+        order = np.argsort(lengths, kind="stable")
+        batches = []
+        start = 0
+        while start < len(order):
+            end = min(start + self.batch_size, len(order))
+            if self.batch_tokens:
+                # Sorted ascending, so the last chunk sets the padded width of the batch
+                end = start + 1
+                while end < len(order) and (end + 1 - start) * lengths[order[end]] <= self.batch_tokens:
+                    end += 1
+            batches.append(order[start:end])
+            start = end
+        return batches
+
+    def _build_analysis(self, processed_text: str, results: Dict[str, List[Dict[str, Any]]],
+                        coverage: Dict[str, int]) -> Dict[str, Any]:
+        """Scores, category details and coverage for one document"""
+        env_results = results["environmental"]
+        soc_results = results["social"]
+        gov_results = results["governance"]
+
+        # Calculate scores
+        env_score = self._calculate_score(env_results)
+        soc_score = self._calculate_score(soc_results)
+        gov_score = self._calculate_score(gov_results)
+
+        # Calculate total score
+        total_score = (env_score + soc_score + gov_score) / 3
+
+        # Generate category details
+        keywords = self._extract_keywords(processed_text)
+        category_details = {
+            "environmental": {
+                "score": env_score,
+                "keywords": keywords["environmental"],
+                "confidence": env_results
+            },
+            "social": {
+                "score": soc_score,
+                "keywords": keywords["social"],
+                "confidence": soc_results
+            },
+            "governance": {
+                "score": gov_score,
+                "keywords": keywords["governance"],
+                "confidence": gov_results
+            }
+        }
+
+        return {
+            "scores": {
+                "environmental": env_score,
+                "social": soc_score,
+                "governance": gov_score,
+                "total": total_score
+            },
+            "category_details": category_details,
+            "coverage": coverage
+        }
+
+    def _chunk_document(self, processed_text: str) -> Tuple[List[List[int]], Dict[str, int]]:
+        """Split a document into the overlapping token windows that will be scored"""
+        token_ids = self.tokenizer(processed_text, add_special_tokens=False)["input_ids"]
+        spans = token_windows(len(token_ids), self.chunk_tokens, self.chunk_overlap)
+        if not spans:
+            spans = [(0, 0)]
+        selected = select_evenly(spans, self.max_chunks)
+        chunks = [token_ids[start:end] for start, end in selected]
+        coverage = {
+            "tokens": len(token_ids),
+            "chunks": len(spans),
+            "chunks_scored": len(chunks)
+        }
+        return chunks, coverage
+
+    def _classify_ids(self, chunks: List[List[int]]) -> Dict[str, np.ndarray]:
+        """Run one padded batch of token windows through the encoder and every head"""
+        encoded = self.tokenizer.pad(
+            {"input_ids": [self.tokenizer.build_inputs_with_special_tokens(chunk) for chunk in chunks]},
+            padding=True,
+            return_tensors="pt"
+        )
+        with timed("esg_classifier"), torch.inference_mode():
+            logits = self.model(encoded["input_ids"], encoded["attention_mask"])
+        return {
+            category: torch.softmax(category_logits, dim=-1).numpy()
+            for category, category_logits in logits.items()
+        }
+
+    def _aggregate_segments(self, probs: np.ndarray, lengths: np.ndarray, starts: np.ndarray,
+                            counts: np.ndarray) -> np.ndarray:
+        """Combine per-chunk label probabilities into one distribution per document
+
+        Rows of probs are chunks in document order; document d owns rows
+        starts[d]:starts[d] + counts[d].
+        """
+        if self.aggregation == "max":
+            # The chunk with the strongest positive signal represents each document
+            positive = probs[:, -1]
+            best = np.repeat(np.maximum.reduceat(positive, starts), counts)
+            doc_ids = np.repeat(np.arange(len(counts)), counts)
+            candidates = np.flatnonzero(positive == best)
+            _, first = np.unique(doc_ids[candidates], return_index=True)
+            return probs[candidates[first]]
+        if self.aggregation == "mean":
+            return np.add.reduceat(probs, starts, axis=0) / counts[:, None]
+        weighted = np.add.reduceat(probs * lengths[:, None], starts, axis=0)
+        return weighted / np.add.reduceat(lengths, starts)[:, None]
+
+    def _to_label_scores(self, probs: np.ndarray) -> List[Dict[str, Any]]:
+        """Format a probability row like text-classification pipeline output"""
+        return [{"label": f"LABEL_{i}", "score": float(p)} for i, p in enumerate(probs)]
+
     def _preprocess_text(self, text: str) -> str:
         # Basic preprocessing
         text = text.lower()
@@ -105,55 +365,7 @@ class ESGAnalyzer:
         positive_score = next((r["score"] for r in results if r["label"] == "LABEL_1"), 0.5)
         return round(positive_score * 100, 2)
 
-    def _extract_keywords(self, text: str, category: str) -> List[str]:
-        # Extract relevant keywords for category
-        keywords = []
-        
-        # Add category-specific keywords
-        if category == "environmental":
-            keywords.extend([
-                "sustainability",
-                "climate change",
-                "carbon emissions",
-                "greenhouse gases",
-                "renewable energy",
-                "water usage"
-            ])
-        elif category == "social":
-            keywords.extend([
-                "diversity",
-                "inclusion",
-                "human rights",
-                "labor practices",
-                "community engagement",
-                "employee welfare"
-            ])
-        elif category == "governance":
-            keywords.extend([
-                "corporate governance",
-                "board composition",
-                "executive compensation",
-                "risk management",
-                "compliance",
-                "transparency"
-            ])
-        
-        # Filter keywords present in text
-        text_words = set(text.lower().split())
-        return [k for k in keywords if k.lower() in text_words]
-            max_score = max(classification["scores"])
-            max_index = classification["scores"].index(max_score)
-            
-            # Set the category score
-            results["scores"][category] = float(max_score)
-            
-            # Store subcategory details
-            results["category_details"][category] = {
-                subcategories[max_index]: float(max_score)
-            }
-
-        # Calculate total score
-        scores = results["scores"].values()
-        results["scores"]["total"] = float(sum(scores) / len(scores))
-
-        return results
+    def _extract_keywords(self, text: str) -> Dict[str, List[str]]:
+        """Category keywords present in the text, found in one pass over it"""
+        found = self.keyword_matcher.found(text)
+        return {category: found.get(category, []) for category in ESG_CATEGORIES}
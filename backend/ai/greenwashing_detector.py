@@ -1,16 +1,121 @@
 """Greenwashing detection module for identifying misleading ESG claims"""
 
-from typing import Dict, List
-from transformers import pipeline
+import os
+from typing import Any, Dict, List, Optional
+import nltk
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+from ai.model_registry import ModelRegistry, default_registry
+from ai.inference_backends import INFERENCE_BACKENDS, LogitsModel, load_inference_model
+from ai.embedding_index import EmbeddingIndex, SentenceEncoder, load_or_build_index
+from ai.metrics import timed
+from ai.phrase_matcher import PhraseMatcher, load_lexicon
+from ai.section_segmenter import SectionIndex
+
+SENTIMENT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# phrase: exact indicator phrases scored by sentiment; semantic: sentences
+# matched against an embedding index of known greenwashing claims
+GREENWASHING_MODES = ("phrase", "semantic")
+
+# Known greenwashing claim patterns, embedded once into the on-disk index;
+# GREENWASHING_CLAIMS_PATH adds more from a JSON lexicon of {type: [claims]}
+CLAIM_PATTERNS = {
+    "vague_sustainability_claims": [
+        "We are committed to a greener, more sustainable future.",
+        "Our products are eco-friendly and good for the planet.",
+        "Sustainability is at the heart of everything we do.",
+        "We care deeply about the environment and our communities."
+    ],
+    "commitment_without_action": [
+        "We aim to become carbon neutral by 2050.",
+        "We aspire to reach net zero emissions in the future.",
+        "We intend to explore opportunities to reduce our environmental footprint.",
+        "We plan to set science-based targets in the coming years."
+    ],
+    "unsubstantiated_environmental_benefits": [
+        "Our packaging is 100% environmentally friendly.",
+        "This product has zero impact on the environment.",
+        "Our operations are completely green and clean.",
+        "Our fuel is a natural and clean energy source."
+    ],
+    "selective_disclosure": [
+        "Emissions from our head office fell by half this year.",
+        "We highlight our best performing sites in this report.",
+        "We reduced emissions in one business unit while overall output grew."
+    ],
+    "offset_reliance": [
+        "We offset all of our emissions by purchasing carbon credits.",
+        "Our flights are carbon neutral thanks to tree planting offsets.",
+        "We achieve climate neutrality through certified offset projects."
+    ],
+    "green_marketing": [
+        "Our brand stands for nature, purity and green living.",
+        "Choose our products to help save the planet.",
+        "Every purchase makes a difference for the earth."
+    ]
+}
 
 class GreenwashingDetector:
-    def __init__(self):
-        """Initialize the greenwashing detector with necessary models"""
-        self.classifier = pipeline(
-            "text-classification",
-            model="nlptown/bert-base-multilingual-uncased-sentiment"
-        )
-        
+    def __init__(self, registry: ModelRegistry = None, inference_backend: str = None, mode: str = None):
+        """Initialize the greenwashing detector; models load on first use"""
+        self.registry = registry or default_registry
+        self.mode = mode or os.getenv("GREENWASHING_MODE", "phrase")
+        if self.mode not in GREENWASHING_MODES:
+            raise ValueError(f"Unknown greenwashing mode '{self.mode}', expected one of {GREENWASHING_MODES}")
+        self.context_chars = int(os.getenv("GREENWASHING_CONTEXT_CHARS", 100))
+        self.batch_size = int(os.getenv("GREENWASHING_BATCH_SIZE", 32))
+        self.max_matches = int(os.getenv("GREENWASHING_MAX_MATCHES", 256))
+
+        # Only the models for the selected mode are registered, so preload skips the others
+        if self.mode == "phrase":
+            self._tokenizer_key = self.registry.register_pretrained(AutoTokenizer, SENTIMENT_MODEL)
+            self._config_key = self.registry.register_pretrained(AutoConfig, SENTIMENT_MODEL)
+
+            # torch (fp32), int8 (dynamic quantization) or onnx (ONNX Runtime)
+            self.inference_backend = inference_backend or os.getenv('GREENWASHING_INFERENCE_BACKEND', 'torch')
+            if self.inference_backend not in INFERENCE_BACKENDS:
+                raise ValueError(
+                    f"Unknown inference backend '{self.inference_backend}', expected one of {INFERENCE_BACKENDS}"
+                )
+            self._classifier_key = self.registry.register(
+                f"sentiment:{SENTIMENT_MODEL}:{self.inference_backend}",
+                lambda: load_inference_model(
+                    self.inference_backend,
+                    lambda: LogitsModel(AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL)),
+                    ["logits"],
+                    onnx_name=f"sentiment-{SENTIMENT_MODEL.replace('/', '--')}"
+                )
+            )
+        else:
+            # Semantic search: report sentences against precomputed claim embeddings.
+            # Sentences are split with the Punkt model sent_tokenize uses for summaries,
+            # which keeps decimals and abbreviations inside their sentence
+            try:
+                nltk.data.find('tokenizers/punkt')
+            except LookupError:
+                nltk.download('punkt')
+            self.sentence_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+            self.max_sentences = int(os.getenv("GREENWASHING_MAX_SENTENCES", 2048))
+            self.top_k = int(os.getenv("GREENWASHING_TOP_K", 1))
+            self.min_similarity = float(os.getenv("GREENWASHING_MIN_SIMILARITY", 0.6))
+            self.encoder = SentenceEncoder(
+                os.getenv("GREENWASHING_EMBEDDING_MODEL", EMBEDDING_MODEL), self.registry,
+                batch_size=int(os.getenv("GREENWASHING_EMBEDDING_BATCH_SIZE", 64))
+            )
+            self.claim_patterns = {label: list(claims) for label, claims in CLAIM_PATTERNS.items()}
+            claims_path = os.getenv("GREENWASHING_CLAIMS_PATH")
+            if claims_path:
+                for label, claims in load_lexicon(claims_path).items():
+                    self.claim_patterns.setdefault(label, []).extend(claims)
+            index_path = os.getenv("GREENWASHING_INDEX_PATH", "./models/greenwashing_index.npz")
+            self._index_key = self.registry.register(
+                f"embedding-index:{self.encoder.model_name}:{index_path}",
+                lambda: load_or_build_index(index_path, self.encoder, self.claim_patterns)
+            )
+
         # Define common greenwashing indicators
         self.indicators = [
             "commitment without action",
@@ -20,32 +125,62 @@ class GreenwashingDetector:
             "green marketing",
             "environmental claims without evidence"
         ]
+        # Each default indicator is its own type; GREENWASHING_LEXICON_PATH adds
+        # phrases from a JSON lexicon, keyed by the warning type they raise
+        self.matcher = PhraseMatcher({i: i.replace(" ", "_") for i in self.indicators})
+        lexicon_path = os.getenv('GREENWASHING_LEXICON_PATH')
+        if lexicon_path:
+            for indicator_type, phrases in load_lexicon(lexicon_path).items():
+                self.matcher.add_many(phrases, indicator_type)
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the detector's output, used to version cached results"""
+        config = {"mode": self.mode, "context_chars": self.context_chars, "max_matches": self.max_matches}
+        if self.mode == "phrase":
+            config.update(model=SENTIMENT_MODEL, inference_backend=self.inference_backend,
+                          indicators=self.matcher.entries())
+        else:
+            config.update(model=self.encoder.model_name, claims=self.claim_patterns, top_k=self.top_k,
+                          min_similarity=self.min_similarity, max_sentences=self.max_sentences)
+        return config
+
+    @property
+    def classifier(self):
+        """Sentiment model for the configured inference backend"""
+        return self.registry.get(self._classifier_key)
+
+    @property
+    def tokenizer(self):
+        return self.registry.get(self._tokenizer_key)
 
-    def analyze_text(self, text: str) -> Dict:
+    @property
+    def claim_index(self) -> EmbeddingIndex:
+        """Embedded claim patterns, built on first use and cached on disk"""
+        return self.registry.get(self._index_key)
+
+    def _expected_stars(self, contexts: List[str]) -> np.ndarray:
+        """Expected 1-5 star sentiment of each context, classified in batches"""
+        stars = np.arange(1, self.registry.get(self._config_key).num_labels + 1)
+        ratings = []
+        for start in range(0, len(contexts), self.batch_size):
+            encoded = self.tokenizer(contexts[start:start + self.batch_size], padding=True,
+                                     truncation=True, return_tensors="pt")
+            with timed("greenwashing_classifier"), torch.inference_mode():
+                logits = self.classifier(encoded["input_ids"], encoded["attention_mask"])["logits"]
+            ratings.append(torch.softmax(logits, dim=-1).numpy() @ stars)
+        return np.concatenate(ratings)
+
+    def analyze_text(self, text: str, sections: Optional[SectionIndex] = None) -> Dict:
         """Analyze text for greenwashing indicators"""
         results = {
             "risk_score": 0.0,
             "indicators": []
         }
 
-        # Check for each indicator
-        for indicator in self.indicators:
-            # Check if indicator is present in text
-            if indicator in text.lower():
-                # Analyze sentiment around the indicator
-                context = text[text.lower().find(indicator)-100:text.lower().find(indicator)+100]
-                sentiment = self.classifier(context)[0]
-                
-                # Calculate risk score based on sentiment
-                risk_score = 1.0 - (sentiment["score"] / 5)  # Convert 1-5 scale to 0-1
-                
-                results["indicators"].append({
-                    "type": indicator.replace(" ", "_"),
-                    "description": indicator,
-                    "confidence": float(risk_score),
-                    "severity": "high" if risk_score > 0.7 else "medium",
-                    "text_snippet": context
-                })
+        if self.mode == "semantic":
+            results["indicators"] = self._semantic_indicators(text, sections)
+        else:
+            results["indicators"] = self._phrase_indicators(text, sections)
 
         # Calculate overall risk score
         if results["indicators"]:
@@ -53,3 +188,62 @@ class GreenwashingDetector:
             results["risk_score"] = float(np.mean(scores))
 
         return results
+
+    def _phrase_indicators(self, text: str, sections: Optional[SectionIndex]) -> List[Dict]:
+        """Indicator phrases, found in one matcher pass and scored by the sentiment of their context"""
+        matches = self.matcher.find_all(text)[:self.max_matches]
+        if not matches:
+            return []
+
+        contexts = [
+            text[max(match.start - self.context_chars, 0):match.end + self.context_chars]
+            for match in matches
+        ]
+        ratings = self._expected_stars(contexts)
+
+        indicators = []
+        for match, context, rating in zip(matches, contexts, ratings):
+            # Calculate risk score based on sentiment
+            risk_score = 1.0 - (float(rating) / 5)  # Convert 1-5 scale to 0-1
+            
+            indicators.append({
+                "type": match.label,
+                "description": match.phrase,
+                "confidence": float(risk_score),
+                "severity": "high" if risk_score > 0.7 else "medium",
+                "text_snippet": context,
+                "offset": match.start,
+                "section": sections.category_at(match.start) if sections is not None else None
+            })
+        return indicators
+
+    def _semantic_indicators(self, text: str, sections: Optional[SectionIndex]) -> List[Dict]:
+        """Report sentences whose embeddings are close to a known greenwashing claim"""
+        spans = [(start, end) for start, end in self.sentence_tokenizer.span_tokenize(text)
+                 if len(text[start:end].split()) >= 4]
+        spans = spans[:self.max_sentences]
+        if not spans:
+            return []
+
+        index = self.claim_index
+        sentences = [text[start:end].strip() for start, end in spans]
+        indicators = []
+        for start in range(0, len(sentences), self.encoder.batch_size):
+            batch = sentences[start:start + self.encoder.batch_size]
+            # One matrix multiply scores the whole batch against every claim pattern
+            scores, hits = index.search(self.encoder.encode(batch), self.top_k)
+            for row, (sentence_scores, sentence_hits) in enumerate(zip(scores, hits)):
+                offset = spans[start + row][0]
+                for score, hit in zip(sentence_scores, sentence_hits):
+                    if score < self.min_similarity:
+                        break
+                    indicators.append({
+                        "type": index.labels[hit],
+                        "description": f"Resembles known claim: {index.texts[hit]}",
+                        "confidence": float(score),
+                        "severity": "high" if score > 0.8 else "medium",
+                        "text_snippet": sentences[start + row],
+                        "offset": offset,
+                        "section": sections.category_at(offset) if sections is not None else None
+                    })
+        return indicators[:self.max_matches]
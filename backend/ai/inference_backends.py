@@ -0,0 +1,116 @@
+"""Alternative CPU inference backends: dynamic int8 quantization and ONNX Runtime"""
+
+from typing import Callable, Dict, List, Sequence
+import hashlib
+import json
+import os
+import torch
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+
+# Models served by these backends take (input_ids, attention_mask) and return named tensors
+NamedOutputModel = Callable[[torch.Tensor, torch.Tensor], Dict[str, torch.Tensor]]
+
+
+class LogitsModel(torch.nn.Module):
+    """Adapt a transformers sequence classifier to the named-output interface"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Dict[str, torch.Tensor]:
+        return {"logits": self.model(input_ids=input_ids, attention_mask=attention_mask).logits}
+
+
+class _TupleOutputs(torch.nn.Module):
+    """Flatten named outputs to a tuple in a fixed order for ONNX export"""
+
+    def __init__(self, model: torch.nn.Module, output_names: List[str]):
+        super().__init__()
+        self.model = model
+        self.output_names = output_names
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        outputs = self.model(input_ids, attention_mask)
+        return tuple(outputs[name] for name in self.output_names)
+
+
+class OnnxModel:
+    def __init__(self, path: str, output_names: List[str]):
+        """Run an exported model with ONNX Runtime behind the named-output interface"""
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The onnx inference backend requires the onnxruntime package")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.output_names = output_names
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Dict[str, torch.Tensor]:
+        outputs = self.session.run(self.output_names, {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy()
+        })
+        return {name: torch.from_numpy(output) for name, output in zip(self.output_names, outputs)}
+
+
+def export_onnx(model: torch.nn.Module, path: str, output_names: List[str]):
+    """Export a named-output model with dynamic batch and sequence axes"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    model.eval()
+    sample = torch.ones((1, 16), dtype=torch.long)
+    dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"}}
+    dynamic_axes.update({name: {0: "batch"} for name in output_names})
+    torch.onnx.export(
+        _TupleOutputs(model, output_names),
+        (sample, sample),
+        path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=output_names,
+        dynamic_axes=dynamic_axes,
+        opset_version=14
+    )
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_fingerprint(onnx_name: str, parts: Sequence[str] = ()) -> str:
+    """Short hash of what an exported graph depends on, including the torch and transformers versions"""
+    import transformers
+    payload = json.dumps([onnx_name, list(parts), torch.__version__, transformers.__version__])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def load_inference_model(backend: str, load_model: Callable[[], torch.nn.Module],
+                         output_names: List[str], onnx_name: str, fingerprint: Sequence[str] = (),
+                         cache_dir: str = None) -> NamedOutputModel:
+    """Build the selected backend from a loader returning a fresh fp32 torch model
+
+    Exported ONNX graphs are cached under a name that includes a fingerprint of
+    onnx_name, the extra fingerprint parts (e.g. a hash of fine-tuned weights)
+    and the library versions, so a change to any of them exports a new graph.
+    """
+    if backend == "torch":
+        return load_model().eval()
+    if backend == "int8":
+        # Dynamic quantization: Linear weights stored as int8, activations quantized on the fly
+        return torch.quantization.quantize_dynamic(load_model().eval(), {torch.nn.Linear},
+                                                   dtype=torch.qint8, inplace=True)
+    if backend == "onnx":
+        directory = cache_dir or os.getenv("ONNX_CACHE_DIR", "./models/onnx")
+        path = os.path.join(directory, f"{onnx_name}-{export_fingerprint(onnx_name, fingerprint)}.onnx")
+        if not os.path.exists(path):
+            print(f"Exporting {onnx_name} to {path}")
+            export_onnx(load_model(), path, output_names)
+        return OnnxModel(path, output_names)
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {INFERENCE_BACKENDS}")
@@ -0,0 +1,88 @@
+"""Shared, lazily loaded model registry for the AI components"""
+
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+from transformers import pipeline
+from ai.metrics import default_metrics
+
+MODEL_LOAD_SECONDS = default_metrics.gauge(
+    "greenstamp_model_load_seconds", "Time taken to load each model", ["model"]
+)
+
+
+class ModelRegistry:
+    def __init__(self):
+        """Track model loaders by key; each model is loaded once, on first use"""
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, key: str, loader: Callable[[], Any]) -> str:
+        """Declare a model; registering an existing key shares the first loader"""
+        with self._lock:
+            if key not in self._loaders:
+                self._loaders[key] = loader
+                self._state[key] = {"state": "pending"}
+                self._key_locks[key] = threading.Lock()
+        return key
+
+    def get(self, key: str) -> Any:
+        """Return the model for key, loading it if this is the first request"""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        # Concurrent callers wait for a single load instead of loading twice
+        with self._key_locks[key]:
+            if key not in self._models:
+                self._state[key] = {"state": "loading"}
+                start = time.perf_counter()
+                try:
+                    self._models[key] = self._loaders[key]()
+                except Exception as e:
+                    self._state[key] = {"state": "failed", "error": str(e)}
+                    raise
+                self._state[key] = {"state": "ready", "load_seconds": round(time.perf_counter() - start, 3)}
+                MODEL_LOAD_SECONDS.set(self._state[key]["load_seconds"], model=key)
+                print(f"Loaded model {key} in {self._state[key]['load_seconds']}s")
+        return self._models[key]
+
+    def register_pipeline(self, task: str, model: str, **kwargs) -> str:
+        """Declare a transformers pipeline, shared by every component asking for (task, model)"""
+        return self.register(f"pipeline:{task}:{model}", lambda: pipeline(task, model=model, **kwargs))
+
+    def register_pretrained(self, cls: Any, name: str, **kwargs) -> str:
+        """Declare a `cls.from_pretrained(name)` object such as a tokenizer or processor"""
+        return self.register(f"{cls.__name__}:{name}", lambda: cls.from_pretrained(name, **kwargs))
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Load state of every registered model"""
+        with self._lock:
+            return {key: dict(state) for key, state in self._state.items()}
+
+    @property
+    def ready(self) -> bool:
+        return all(state["state"] == "ready" for state in self.status().values())
+
+    def preload(self, keys: Optional[List[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """Load registered models now, optionally on a background thread"""
+        def load_all():
+            for key in keys or list(self._loaders):
+                try:
+                    self.get(key)
+                except Exception as e:
+                    print(f"Error loading model {key}: {str(e)}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+
+# Registry shared by the backend components
+default_registry = ModelRegistry()
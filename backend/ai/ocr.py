@@ -0,0 +1,241 @@
+"""OCR engines for scanned report pages"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from PIL import Image
+import pytesseract
+import torch
+from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+from ai.model_registry import ModelRegistry, default_registry
+
+TROCR_MODEL_ID = 'microsoft/trocr-base-handwritten'
+OCR_BACKENDS = ("auto", "tesseract", "trocr")
+
+
+class OCRResult(NamedTuple):
+    """Recognized page text with a 0-1 confidence"""
+    text: str
+    confidence: float
+    backend: str
+
+
+def segment_lines(image: Image.Image, ink_threshold: int = 160, min_height: int = 6,
+                  max_gap: int = 2, padding: int = 4) -> List[Image.Image]:
+    """Split a page image into text-line crops, top to bottom
+
+    Uses a horizontal projection profile: rows containing dark pixels are
+    grouped into bands, small gaps inside a band are bridged, and each band
+    is cropped to the horizontal extent of its ink.
+    """
+    gray = np.asarray(image.convert("L"))
+    ink = gray < ink_threshold
+    height, width = ink.shape
+    row_has_ink = ink.sum(axis=1) > max(1, int(width * 0.002))
+
+    bands = []
+    start = None
+    gap = 0
+    for y, has_ink in enumerate(row_has_ink):
+        if has_ink:
+            if start is None:
+                start = y
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap > max_gap:
+                bands.append((start, y - gap + 1))
+                start = None
+                gap = 0
+    if start is not None:
+        bands.append((start, height - gap))
+
+    lines = []
+    for top, bottom in bands:
+        if bottom - top < min_height:
+            continue
+        columns = np.flatnonzero(ink[top:bottom].any(axis=0))
+        box = (
+            max(int(columns[0]) - padding, 0),
+            max(top - padding, 0),
+            min(int(columns[-1]) + 1 + padding, width),
+            min(bottom + padding, height)
+        )
+        lines.append(image.crop(box).convert("RGB"))
+    return lines
+
+
+class OCRBackend:
+    """Interface shared by the OCR engines"""
+    name = "base"
+    # Identifies the engine and its settings in page-cache keys
+    model_id = "base"
+
+    def recognize(self, image: Image.Image) -> OCRResult:
+        """Recognize the text on one page image"""
+        return self.recognize_many([image])[0]
+
+    def recognize_many(self, images: List[Image.Image]) -> List[OCRResult]:
+        """Recognize several page images"""
+        raise NotImplementedError
+
+
+def _tesseract_page(image: Image.Image, lang: str, config: str) -> OCRResult:
+    """Run Tesseract on one page and rebuild its lines in reading order"""
+    data = pytesseract.image_to_data(image, lang=lang, config=config,
+                                     output_type=pytesseract.Output.DICT)
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(confidence)
+
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = float(np.mean(confidences)) / 100 if confidences else 0.0
+    return OCRResult(text, confidence, TesseractBackend.name)
+
+
+class TesseractBackend(OCRBackend):
+    name = "tesseract"
+
+    def __init__(self, lang: Optional[str] = None, workers: Optional[int] = None):
+        """Initialize the Tesseract engine for printed pages"""
+        self.lang = lang or os.getenv("TESSERACT_LANG", "eng")
+        self.config = os.getenv("TESSERACT_CONFIG", "--oem 1 --psm 3")
+        self.workers = workers or int(os.getenv("TESSERACT_WORKERS", os.cpu_count() or 1))
+        self.model_id = f"tesseract:{self.lang}:{self.config}"
+        if self.workers > 1:
+            # Parallelism comes from running pages side by side, not OpenMP inside one page
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    def recognize_many(self, images: List[Image.Image]) -> List[OCRResult]:
+        """Recognize pages concurrently, one tesseract process per page"""
+        if self.workers <= 1 or len(images) <= 1:
+            return [_tesseract_page(image, self.lang, self.config) for image in images]
+        # pytesseract shells out to the tesseract binary, so threads are enough to keep
+        # one OS process per page busy without pickling page images to a process pool
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(images))) as pool:
+            return list(pool.map(lambda image: _tesseract_page(image, self.lang, self.config), images))
+
+
+class TrOCRBackend(OCRBackend):
+    name = "trocr"
+
+    def __init__(self, model_id: str = TROCR_MODEL_ID, batch_size: Optional[int] = None,
+                 device: Optional[str] = None, registry: Optional[ModelRegistry] = None):
+        """Initialize the TrOCR line recognizer; weights load on first use"""
+        self.model_id = f"{model_id}:lines"
+        self.batch_size = batch_size or int(os.getenv("OCR_BATCH_SIZE", 16))
+        self.max_new_tokens = int(os.getenv("OCR_MAX_LINE_TOKENS", 64))
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.registry = registry or default_registry
+        self._processor_key = self.registry.register_pretrained(TrOCRProcessor, model_id)
+        self._model_key = self.registry.register(
+            f"VisionEncoderDecoderModel:{model_id}:{self.device}",
+            lambda: VisionEncoderDecoderModel.from_pretrained(model_id).to(self.device).eval()
+        )
+
+    @property
+    def processor(self) -> TrOCRProcessor:
+        return self.registry.get(self._processor_key)
+
+    @property
+    def model(self) -> VisionEncoderDecoderModel:
+        return self.registry.get(self._model_key)
+
+    def recognize_many(self, images: List[Image.Image]) -> List[OCRResult]:
+        """Recognize several page images, batching line crops across pages"""
+        # TrOCR is a single-line model: segment pages and remember where each line came from
+        crops: List[Tuple[int, Image.Image]] = []
+        for page_index, image in enumerate(images):
+            for line in segment_lines(image):
+                crops.append((page_index, line))
+
+        recognized = self._generate([line for _, line in crops])
+
+        pages: List[List[Tuple[str, float]]] = [[] for _ in images]
+        for (page_index, _), (text, confidence) in zip(crops, recognized):
+            if text.strip():
+                pages[page_index].append((text, confidence))
+        return [
+            OCRResult(
+                "\n".join(text for text, _ in lines),
+                float(np.mean([confidence for _, confidence in lines])) if lines else 0.0,
+                self.name
+            )
+            for lines in pages
+        ]
+
+    def _generate(self, lines: List[Image.Image]) -> List[Tuple[str, float]]:
+        """Run line crops through the encoder-decoder in fixed-size batches"""
+        recognized = []
+        for i in range(0, len(lines), self.batch_size):
+            batch = lines[i:i + self.batch_size]
+            pixel_values = self.processor(images=batch, return_tensors="pt").pixel_values.to(self.device)
+            with torch.inference_mode():
+                outputs = self.model.generate(
+                    pixel_values,
+                    max_new_tokens=self.max_new_tokens,
+                    output_scores=True,
+                    return_dict_in_generate=True
+                )
+                # Mean token probability of each generated line. Lines that finish early are
+                # padded to the longest line in the batch; those positions are left out
+                token_scores = self.model.compute_transition_scores(
+                    outputs.sequences, outputs.scores, normalize_logits=True
+                )
+                generated = outputs.sequences[:, -token_scores.shape[1]:]
+                mask = (generated != self.processor.tokenizer.pad_token_id).to(token_scores.dtype)
+                token_probs = torch.exp(token_scores) * mask
+                confidences = (token_probs.sum(dim=-1) / mask.sum(dim=-1).clamp(min=1)).tolist()
+            texts = self.processor.batch_decode(outputs.sequences, skip_special_tokens=True)
+            recognized.extend(zip(texts, confidences))
+        return recognized
+
+
+class RoutingOCRBackend(OCRBackend):
+    name = "auto"
+
+    def __init__(self, primary: OCRBackend, fallback_factory: Callable[[], OCRBackend],
+                 fallback_id: str, min_confidence: Optional[float] = None):
+        """Use the fast primary engine and retry low-confidence pages on the fallback"""
+        self.primary = primary
+        self.min_confidence = (min_confidence if min_confidence is not None
+                               else float(os.getenv("OCR_MIN_CONFIDENCE", 0.6)))
+        self.model_id = f"auto:{primary.model_id}|{fallback_id}@{self.min_confidence}"
+        self._fallback_factory = fallback_factory
+        self._fallback = None
+
+    @property
+    def fallback(self) -> OCRBackend:
+        # The transformer fallback is only loaded once a page actually needs it
+        if self._fallback is None:
+            self._fallback = self._fallback_factory()
+        return self._fallback
+
+    def recognize_many(self, images: List[Image.Image]) -> List[OCRResult]:
+        results = self.primary.recognize_many(images)
+        retry = [i for i, result in enumerate(results) if result.confidence < self.min_confidence]
+        if retry:
+            for i, result in zip(retry, self.fallback.recognize_many([images[i] for i in retry])):
+                # Keep whichever engine is more confident about the page
+                if result.text.strip() and result.confidence > results[i].confidence:
+                    results[i] = result
+        return results
+
+
+def create_ocr_backend(name: Optional[str] = None) -> OCRBackend:
+    """Build the OCR backend selected by name or the OCR_BACKEND environment variable"""
+    name = name or os.getenv("OCR_BACKEND", "auto")
+    if name == "tesseract":
+        return TesseractBackend()
+    if name == "trocr":
+        return TrOCRBackend()
+    if name == "auto":
+        return RoutingOCRBackend(TesseractBackend(), TrOCRBackend, f"{TROCR_MODEL_ID}:lines")
+    raise ValueError(f"Unknown OCR backend '{name}', expected one of {OCR_BACKENDS}")
@@ -0,0 +1,60 @@
+"""Page extraction run inside the document processor's worker processes
+
+This module imports PyMuPDF and nothing from the model stack, so extraction
+workers start without loading torch or transformers.
+"""
+
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+# (source, document hash, open document) of the report this worker is reading
+_worker_doc = None
+
+
+def _read_shared(name: str, size: int) -> bytes:
+    """Copy a report out of the shared memory block the parent placed it in"""
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        # Blocks are rounded up to whole pages, so only the first size bytes are the report
+        return bytes(block.buf[:size])
+    finally:
+        block.close()
+
+
+def worker_document(source: str, doc_hash: str, size: Optional[int] = None, filetype: str = "pdf"):
+    """Open a report in an extraction worker, reusing the handle across its page groups
+
+    source is a file path, or with size the name of a shared memory block holding
+    an in-memory upload. Each worker opens its own document handle because PyMuPDF
+    documents must not be shared between threads or processes.
+    """
+    global _worker_doc
+    if _worker_doc is None or _worker_doc[:2] != (source, doc_hash):
+        if _worker_doc is not None:
+            _worker_doc[2].close()
+        if size is None:
+            doc = fitz.open(source)
+        else:
+            doc = fitz.open(stream=_read_shared(source, size), filetype=filetype)
+        _worker_doc = (source, doc_hash, doc)
+    return _worker_doc[2]
+
+
+def extract_pages(source: str, doc_hash: str, page_nums: List[int],
+                  size: Optional[int] = None, filetype: str = "pdf") -> List[Tuple[int, str, float]]:
+    """Process pool worker: extract native text from a group of pages
+
+    Each page comes back with the seconds its get_text took, for the parent to record.
+    Pages without text are rendered later by the parent, one OCR batch at a time,
+    so rasters never queue up between the workers and the OCR thread.
+    """
+    doc = worker_document(source, doc_hash, size, filetype)
+    extracted = []
+    for page_num in page_nums:
+        t0 = time.perf_counter()
+        text = doc[page_num].get_text()
+        extracted.append((page_num, text, time.perf_counter() - t0))
+    return extracted
@@ -0,0 +1,146 @@
+"""Multi-phrase matching with an Aho-Corasick automaton"""
+
+import json
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class PhraseMatch(NamedTuple):
+    phrase: str
+    label: Optional[str]
+    start: int
+    end: int
+
+
+Automaton = Tuple[List[Dict[str, int]], List[int], List[List[int]], List[str], List[Optional[str]]]
+
+
+def _fold(text: str) -> str:
+    """Lower-case text without changing its length, so offsets stay valid"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. "İ") lower-case to more than one code point
+    return "".join(c.lower()[0] for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class PhraseMatcher:
+    """Finds every occurrence of a set of phrases in a single pass over the text
+
+    The automaton is compiled once, so matching cost depends on the text length
+    and the number of hits, not on how many phrases are in the lexicon. Matches
+    are case-insensitive and only count on word boundaries. Phrases added after
+    matching has started trigger a recompile on the next match.
+    """
+
+    def __init__(self, phrases: Dict[str, Optional[str]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        # Phrase indices ending exactly at each node, before merging along failure links
+        self._own: List[List[int]] = [[]]
+        self._phrases: List[str] = []
+        self._labels: List[Optional[str]] = []
+        # Compiled (goto, fail, out, phrases, labels), replaced whole so matching never sees a partial build
+        self._automaton: Optional[Automaton] = None
+        self._lock = threading.Lock()
+        for phrase, label in (phrases or {}).items():
+            self.add(phrase, label)
+        self._compile()
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def entries(self) -> List[Tuple[str, Optional[str]]]:
+        """(phrase, label) pairs in the order they were added"""
+        return list(zip(self._phrases, self._labels))
+
+    def add(self, phrase: str, label: Optional[str] = None):
+        """Add a phrase, optionally tagged with a label such as its category"""
+        key = _fold(phrase.strip())
+        if not key:
+            return
+        with self._lock:
+            node = 0
+            for c in key:
+                nxt = self._goto[node].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][c] = nxt
+                    self._goto.append({})
+                    self._own.append([])
+                node = nxt
+            self._own[node].append(len(self._phrases))
+            self._phrases.append(phrase.strip())
+            self._labels.append(label)
+            self._automaton = None
+
+    def add_many(self, phrases: Iterable[str], label: Optional[str] = None):
+        for phrase in phrases:
+            self.add(phrase, label)
+
+    def _compile(self) -> Automaton:
+        """Build failure links breadth-first and merge outputs along them"""
+        with self._lock:
+            if self._automaton is not None:
+                return self._automaton
+            goto = [dict(edges) for edges in self._goto]
+            fail = [0] * len(goto)
+            out = [list(own) for own in self._own]
+            queue = deque(goto[0].values())
+            while queue:
+                node = queue.popleft()
+                for c, nxt in goto[node].items():
+                    queue.append(nxt)
+                    link = fail[node]
+                    while link and c not in goto[link]:
+                        link = fail[link]
+                    # Children of the root fail back to the root
+                    fail[nxt] = goto[link].get(c, 0) if node else 0
+                    out[nxt] += out[fail[nxt]]
+            self._automaton = (goto, fail, out, list(self._phrases), list(self._labels))
+            return self._automaton
+
+    def find_all(self, text: str) -> List[PhraseMatch]:
+        """All word-bounded phrase occurrences, ordered by start offset"""
+        goto, fail, out, phrases, labels = self._automaton or self._compile()
+        folded = _fold(text)
+        matches = []
+        node = 0
+        for i, c in enumerate(folded):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            if not out[node]:
+                continue
+            end = i + 1
+            if end < len(text) and _is_word_char(text[end]):
+                continue
+            for index in out[node]:
+                start = end - len(phrases[index])
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                matches.append(PhraseMatch(phrases[index], labels[index], start, end))
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return matches
+
+    def found(self, text: str) -> Dict[Optional[str], List[str]]:
+        """Distinct phrases present in the text, grouped by label in lexicon order"""
+        hits = {m.phrase for m in self.find_all(text)}
+        grouped: Dict[Optional[str], List[str]] = {}
+        for phrase, label in zip(self._phrases, self._labels):
+            if phrase in hits and phrase not in grouped.setdefault(label, []):
+                grouped[label].append(phrase)
+        return grouped
+
+
+def load_lexicon(path: str) -> Dict[str, List[str]]:
+    """Read a JSON lexicon of {label: [phrases]}"""
+    with open(path, encoding="utf-8") as f:
+        lexicon = json.load(f)
+    if not isinstance(lexicon, dict) or not all(isinstance(v, list) for v in lexicon.values()):
+        raise ValueError(f"Lexicon {path} must map labels to lists of phrases")
+    return lexicon
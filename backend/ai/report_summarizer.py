@@ -1,109 +1,354 @@
 """Report summarization module for generating concise ESG report summaries"""
 
-from typing import Dict, List
-from transformers import pipeline
+from typing import Any, Callable, Dict, List, Optional
 import numpy as np
 from nltk.tokenize import sent_tokenize
 import nltk
+import os
+import re
+import time
+import torch
+from sklearn.feature_extraction.text import TfidfVectorizer
+from ai.chunking import token_windows, select_evenly
+from ai.section_segmenter import SectionIndex, segment_text
+from ai.model_registry import ModelRegistry, default_registry
+from ai.metrics import timed
+
+SUMMARY_MODEL = "facebook/bart-large-cnn"
+KEY_POINT_MODEL = "facebook/bart-large-mnli"
+SUMMARY_MODES = ("abstractive", "extractive", "hybrid")
+# Parts of a summary, in the order they are produced
+SUMMARY_PIECES = ("executive_summary", "key_points", "section_summaries", "recommendations")
+
+# Categories to classify statements into
+KEY_POINT_CATEGORIES = [
+    "environmental_initiative",
+    "social_responsibility",
+    "governance_practice",
+    "risk_management",
+    "future_commitment",
+    "achievement",
+    "challenge"
+]
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+# Cheap cues used to pick candidate sentences before running the NLI model
+KEY_POINT_CUES = re.compile(
+    r"\b(emission|carbon|climate|renewable|energy|water|waste|biodiversity|diversity|inclusion|"
+    r"employee|human rights|safety|community|board|governance|compliance|audit|risk|target|"
+    r"commit|reduc|increas|achiev|challenge|goal|net zero|scope [123])",
+    re.IGNORECASE
+)
+
+def rank_sentences(sentences: List[str], damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    """TextRank sentence centrality over TF-IDF cosine similarity"""
+    if len(sentences) < 2:
+        return np.ones(len(sentences))
+    try:
+        tfidf = TfidfVectorizer(stop_words="english").fit_transform(sentences)
+    except ValueError:
+        # Only stop words or punctuation: fall back to document order
+        return np.linspace(1.0, 0.0, len(sentences))
+
+    # Rows are L2-normalised, so S = tfidf @ tfidf.T is the cosine similarity matrix.
+    # S is never materialised: it can be close to dense on long reports, so every
+    # product with it is taken as tfidf @ (tfidf.T @ x), minus the diagonal.
+    count = len(sentences)
+    self_similarity = np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel()
+
+    def similarity_dot(x: np.ndarray) -> np.ndarray:
+        return tfidf @ (tfidf.T @ x) - self_similarity * x
+
+    row_sums = similarity_dot(np.ones(count))
+    linked = row_sums > 1e-12
+    inverse_sums = np.divide(1.0, row_sums, out=np.zeros(count), where=linked)
+
+    scores = np.full(count, 1.0 / count)
+    for _ in range(iterations):
+        # transition.T @ scores, where sentences without neighbours link uniformly to all
+        spread = similarity_dot(scores * inverse_sums) + scores[~linked].sum() / count
+        scores = (1 - damping) / count + damping * spread
+    return scores
+
+
+def top_sentences(sentences: List[str], scores: np.ndarray, count: int) -> List[str]:
+    """The `count` highest scoring sentences, in their original order"""
+    best = sorted(np.argsort(-scores, kind="stable")[:count])
+    return [sentences[i] for i in best]
+
+
+class StageGraph:
+    """Named pipeline artifacts computed at most once, on first use
+
+    Each stage is a function of the graph, so it can pull the artifacts it
+    depends on; timings are exclusive of the time spent in those dependencies.
+    """
+
+    def __init__(self, stages: Dict[str, Callable[["StageGraph"], Any]]):
+        self._stages = stages
+        self._values: Dict[str, Any] = {}
+        self._child_time: List[float] = []
+        self.timings: Dict[str, float] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._values:
+            self._child_time.append(0.0)
+            start = time.perf_counter()
+            self._values[name] = self._stages[name](self)
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed - self._child_time.pop(), 4)
+            if self._child_time:
+                self._child_time[-1] += elapsed
+        return self._values[name]
+
 
 class ReportSummarizer:
-    def __init__(self):
-        """Initialize the report summarizer with necessary models"""
+    def __init__(self, registry: ModelRegistry = None):
+        """Initialize the report summarizer; BART models load on first use"""
         try:
             nltk.data.find('tokenizers/punkt')
         except LookupError:
             nltk.download('punkt')
             
-        self.summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        self.key_points_extractor = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-
-    def summarize(self, text: str) -> Dict:
-        """Generate a comprehensive summary of the ESG report"""
-        results = {
-            "executive_summary": self._generate_executive_summary(text),
-            "key_points": self._extract_key_points(text),
-            "section_summaries": self._generate_section_summaries(text),
-            "recommendations": self._generate_recommendations(text)
+        self.registry = registry or default_registry
+        self._summarizer_key = self.registry.register_pipeline("summarization", model=SUMMARY_MODEL)
+        self._key_points_key = self.registry.register_pipeline("zero-shot-classification", model=KEY_POINT_MODEL)
+
+        # Map-reduce summarization: chunks are sized in BART tokens, summarized in batches,
+        # and the number of chunks and reduce rounds bounds total generation per report
+        self._chunk_tokens = int(os.getenv("SUMMARY_CHUNK_TOKENS", 0)) or None
+        self.summary_batch_size = int(os.getenv("SUMMARY_BATCH_SIZE", 4))
+        self.summary_max_chunks = int(os.getenv("SUMMARY_MAX_CHUNKS", 24))
+        self.summary_max_rounds = int(os.getenv("SUMMARY_MAX_REDUCE_ROUNDS", 3))
+
+        # Summarization mode and the sentence budgets of the extractive and hybrid modes
+        self.mode = os.getenv("SUMMARY_MODE", "abstractive")
+        self.extractive_sentences = int(os.getenv("SUMMARY_EXTRACTIVE_SENTENCES", 5))
+        self.hybrid_sentences = int(os.getenv("SUMMARY_HYBRID_SENTENCES", 40))
+
+        # Work caps for key point extraction: candidate sentences per report, NLI pairs per forward pass
+        self.key_point_max_sentences = int(os.getenv("KEY_POINT_MAX_SENTENCES", 96))
+        self.key_point_batch_size = int(os.getenv("KEY_POINT_BATCH_SIZE", 64))
+
+    def config(self) -> Dict[str, Any]:
+        """Settings that change the summary, used to version cached results; the mode is keyed separately"""
+        return {
+            "summary_model": SUMMARY_MODEL,
+            "key_point_model": KEY_POINT_MODEL,
+            "chunk_tokens": self._chunk_tokens,
+            "max_chunks": self.summary_max_chunks,
+            "max_reduce_rounds": self.summary_max_rounds,
+            "extractive_sentences": self.extractive_sentences,
+            "hybrid_sentences": self.hybrid_sentences,
+            "key_point_max_sentences": self.key_point_max_sentences
         }
+
+    @property
+    def summarizer(self):
+        return self.registry.get(self._summarizer_key)
+
+    @property
+    def key_points_extractor(self):
+        return self.registry.get(self._key_points_key)
+
+    @property
+    def chunk_tokens(self) -> int:
+        """Chunk size in summarizer tokens, capped by the model window"""
+        tokenizer = self.summarizer.tokenizer
+        max_window = tokenizer.model_max_length - tokenizer.num_special_tokens_to_add()
+        return min(self._chunk_tokens or max_window, max_window)
+
+    def summarize(self, text: str, mode: str = None, sections: Optional[SectionIndex] = None,
+                  on_piece: Optional[Callable[[str, Any], None]] = None) -> Dict:
+        """Generate a comprehensive summary of the ESG report
+
+        mode is "abstractive" (BART over the whole report), "extractive"
+        (TextRank sentence selection, no generation) or "hybrid" (BART over
+        the top-ranked sentences only); it defaults to SUMMARY_MODE.
+        sections is a prebuilt index of `text`; it is segmented here if omitted.
+        on_piece is called with (name, value) as each part of the summary is ready.
+        """
+        mode = self.resolve_mode(mode)
+        graph = self._build_stage_graph(text, mode, sections)
+        results = {}
+        for piece in SUMMARY_PIECES:
+            results[piece] = graph[piece]
+            if on_piece is not None:
+                on_piece(piece, results[piece])
+        results["metadata"] = {"mode": mode, "stage_timings": graph.timings}
         return results
 
-    def _generate_executive_summary(self, text: str, max_length: int = 300) -> str:
+    def resolve_mode(self, mode: str = None) -> str:
+        """Validate a summarization mode, falling back to the configured default"""
+        mode = mode or self.mode
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"Unknown summary mode '{mode}', expected one of {SUMMARY_MODES}")
+        return mode
+
+    def _build_stage_graph(self, text: str, mode: str, sections: Optional[SectionIndex] = None) -> StageGraph:
+        """Wire the summarization stages so shared artifacts are computed once"""
+        return StageGraph({
+            "sentences": lambda g: sent_tokenize(text),
+            "sections": lambda g: sections if sections is not None else segment_text(text),
+            "sentence_scores": lambda g: rank_sentences(g["sentences"]),
+            "summary_sentences": lambda g: (
+                g["sentences"] if mode == "abstractive"
+                else top_sentences(g["sentences"], g["sentence_scores"], self.hybrid_sentences)
+            ),
+            "chunks": lambda g: select_evenly(self._pack(g["summary_sentences"], self.chunk_tokens),
+                                              self.summary_max_chunks),
+            "chunk_summaries": lambda g: self._summarize_chunks(g["chunks"]),
+            "executive_summary": lambda g: (
+                " ".join(top_sentences(g["sentences"], g["sentence_scores"], self.extractive_sentences))
+                if mode == "extractive"
+                else self._generate_executive_summary(g["chunk_summaries"])
+            ),
+            "key_points": lambda g: self._key_points_from_sentences(g["sentences"]),
+            "section_summaries": lambda g: self._generate_section_summaries(g["sections"], mode),
+            "recommendations": lambda g: self._generate_recommendations(g["key_points"])
+        })
+
+    def _summarize_chunks(self, chunks: List[str]) -> List[str]:
+        """Map step: summarize every chunk, batching them through the pipeline"""
+        return self._summarize_batch(chunks, max_length=150, min_length=50)
+
+    def _generate_executive_summary(self, chunk_summaries: List[str], max_length: int = 300) -> str:
         """Generate a concise executive summary"""
-        # Split text into chunks that fit within model's max token limit
-        chunks = self._split_text(text, max_length=1024)
-        summaries = []
-        
-        for chunk in chunks:
-            summary = self.summarizer(chunk, 
-                                    max_length=150, 
-                                    min_length=50,
-                                    do_sample=False)
-            summaries.append(summary[0]['summary_text'])
-        
+        # Reduce step: regroup summaries into model-sized chunks until they fit one window
+        summaries = chunk_summaries
+        for _ in range(self.summary_max_rounds):
+            if len(summaries) <= 1 or sum(self._token_lengths(summaries)) <= self.chunk_tokens:
+                break
+            summaries = self._summarize_batch(self._pack(summaries, self.chunk_tokens),
+                                              max_length=150, min_length=50)
+
         # Combine and summarize again if needed
         final_summary = " ".join(summaries)
-        if len(final_summary) > max_length:
-            final_summary = self.summarizer(final_summary,
-                                          max_length=max_length,
-                                          min_length=max_length//2,
-                                          do_sample=False)[0]['summary_text']
+        if final_summary and self._token_lengths([final_summary])[0] > max_length:
+            final_summary = self._summarize_batch([final_summary],
+                                                  max_length=max_length,
+                                                  min_length=max_length//2)[0]
         
         return final_summary
 
+    def _summarize_batch(self, texts: List[str], max_length: int, min_length: int) -> List[str]:
+        """Run several texts through BART in batches of summary_batch_size"""
+        if not texts:
+            return []
+        with timed("bart_summarization"):
+            outputs = self.summarizer(texts,
+                                      batch_size=self.summary_batch_size,
+                                      max_length=max_length,
+                                      min_length=min_length,
+                                      do_sample=False,
+                                      truncation=True)
+        return [output['summary_text'] for output in outputs]
+
     def _extract_key_points(self, text: str) -> List[Dict]:
         """Extract key points from the text"""
-        # Categories to classify statements into
-        categories = [
-            "environmental_initiative",
-            "social_responsibility",
-            "governance_practice",
-            "risk_management",
-            "future_commitment",
-            "achievement",
-            "challenge"
-        ]
-        
-        sentences = sent_tokenize(text)
+        return self._key_points_from_sentences(sent_tokenize(text))
+
+    def _key_points_from_sentences(self, all_sentences: List[str]) -> List[Dict]:
+        """Extract key points from already tokenized sentences"""
+        sentences = self._candidate_sentences(all_sentences)
+        if not sentences:
+            return []
+
+        scores = self._score_key_points(sentences, KEY_POINT_CATEGORIES)
         key_points = []
         
-        for sentence in sentences:
-            result = self.key_points_extractor(sentence, categories, multi_label=True)
-            max_score = max(result['scores'])
+        for sentence, sentence_scores in zip(sentences, scores):
+            best = int(np.argmax(sentence_scores))
+            max_score = float(sentence_scores[best])
             
             if max_score > 0.7:  # Only include high-confidence points
                 key_points.append({
                     "point": sentence,
-                    "category": result['labels'][result['scores'].index(max_score)],
-                    "confidence": float(max_score)
+                    "category": KEY_POINT_CATEGORIES[best],
+                    "confidence": max_score
                 })
         
         # Sort by confidence and return top points
         key_points.sort(key=lambda x: x['confidence'], reverse=True)
         return key_points[:10]
 
-    def _generate_section_summaries(self, text: str) -> Dict[str, str]:
+    def _candidate_sentences(self, sentences: List[str]) -> List[str]:
+        """Pick the sentences most likely to be key points, capped per report"""
+        ranked = []
+        for index, sentence in enumerate(sentences):
+            words = len(sentence.split())
+            if words < 6 or words > 80:
+                continue
+            score = len(KEY_POINT_CUES.findall(sentence)) + (1 if re.search(r"\d", sentence) else 0)
+            if score:
+                ranked.append((score, index, sentence))
+
+        ranked.sort(key=lambda x: (-x[0], x[1]))
+        selected = sorted(ranked[:self.key_point_max_sentences], key=lambda x: x[1])
+        return [sentence for _, _, sentence in selected]
+
+    def _score_key_points(self, sentences: List[str], labels: List[str]) -> np.ndarray:
+        """Multi-label zero-shot scores for every (sentence, label) pair, batched
+
+        Equivalent to the zero-shot pipeline with multi_label=True, but many
+        premise/hypothesis pairs share each forward pass and sentences of
+        similar length are batched together to limit padding.
+        """
+        nli = self.key_points_extractor
+        entailment_id = nli.entailment_id
+        contradiction_id = -1 if entailment_id == 0 else 0
+        hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for label in labels]
+
+        order = sorted(range(len(sentences)), key=lambda i: len(sentences[i]))
+        sentences_per_batch = max(1, self.key_point_batch_size // len(labels))
+        scores = np.zeros((len(sentences), len(labels)))
+
+        for start in range(0, len(order), sentences_per_batch):
+            batch = order[start:start + sentences_per_batch]
+            premises = [sentences[i] for i in batch for _ in hypotheses]
+            encoded = nli.tokenizer(
+                premises,
+                hypotheses * len(batch),
+                padding=True,
+                truncation="only_first",
+                return_tensors="pt"
+            )
+            with timed("zero_shot"), torch.inference_mode():
+                logits = nli.model(**encoded).logits
+            entail_contr = logits[:, [contradiction_id, entailment_id]].reshape(len(batch), len(labels), 2)
+            scores[batch] = torch.softmax(entail_contr, dim=-1)[..., 1].numpy()
+
+        return scores
+
+    def _generate_section_summaries(self, index: SectionIndex, mode: str = "abstractive") -> Dict[str, str]:
         """Generate summaries for different sections of the report"""
         sections = {
-            "environmental": self._extract_section(text, "environmental"),
-            "social": self._extract_section(text, "social"),
-            "governance": self._extract_section(text, "governance")
+            "environmental": self._extract_section(index, "environmental"),
+            "social": self._extract_section(index, "social"),
+            "governance": self._extract_section(index, "governance")
         }
-        
-        summaries = {}
-        for section, content in sections.items():
-            if content:
-                summary = self.summarizer(content,
-                                        max_length=200,
-                                        min_length=50,
-                                        do_sample=False)[0]['summary_text']
-                summaries[section] = summary
-        
-        return summaries
+        contents = {section: content for section, content in sections.items() if content}
+
+        if mode != "abstractive":
+            # Narrow each section down to its most central sentences first
+            for section, content in contents.items():
+                sentences = sent_tokenize(content)
+                count = self.extractive_sentences if mode == "extractive" else self.hybrid_sentences
+                contents[section] = " ".join(top_sentences(sentences, rank_sentences(sentences), count))
+            if mode == "extractive":
+                return contents
 
-    def _generate_recommendations(self, text: str) -> List[str]:
-        """Generate recommendations based on the report content"""
+        names = list(contents)
+        summaries = self._summarize_batch([contents[name] for name in names], max_length=200, min_length=50)
+        return dict(zip(names, summaries))
+
+    def _extract_section(self, index: SectionIndex, category: str) -> str:
+        """Text of the report sections mapped to an E/S/G category"""
+        return index.text_for(category)
+
+    def _generate_recommendations(self, key_points: List[Dict]) -> List[str]:
+        """Generate recommendations based on the report's key points"""
         # Simple recommendation generation based on key points
-        key_points = self._extract_key_points(text)
         recommendations = []
         
         for point in key_points:
@@ -114,23 +359,33 @@ class ReportSummarizer:
         
         return recommendations[:5]
 
-    def _split_text(self, text: str, max_length: int = 1024) -> List[str]:
-        """Split text into chunks for processing"""
-        words = text.split()
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """Length of each text in summarizer tokens"""
+        encoded = self.summarizer.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def _pack(self, texts: List[str], budget: int) -> List[str]:
+        """Greedily pack consecutive texts into chunks of at most `budget` tokens"""
+        tokenizer = self.summarizer.tokenizer
         chunks = []
-        current_chunk = []
+        current = []
         current_length = 0
         
-        for word in words:
-            if current_length + len(word) + 1 <= max_length:
-                current_chunk.append(word)
-                current_length += len(word) + 1
-            else:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_length = len(word) + 1
+        for text, length in zip(texts, self._token_lengths(texts)):
+            if current and current_length + length > budget:
+                chunks.append(" ".join(current))
+                current = []
+                current_length = 0
+            if length > budget:
+                # A single oversized text is cut into token windows
+                ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+                for start, end in token_windows(len(ids), budget):
+                    chunks.append(tokenizer.decode(ids[start:end]))
+                continue
+            current.append(text)
+            current_length += length
         
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
+        if current:
+            chunks.append(" ".join(current))
         
         return chunks
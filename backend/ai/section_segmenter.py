@@ -0,0 +1,122 @@
+"""Single-pass segmentation of report text into E/S/G sections"""
+
+import bisect
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Vocabulary used to map headings (and, failing that, section bodies) to E/S/G
+CATEGORY_TERMS = {
+    "environmental": [
+        "environment", "environmental", "climate", "emission", "emissions", "carbon", "energy",
+        "water", "waste", "biodiversity", "nature", "pollution", "greenhouse", "net zero", "tcfd"
+    ],
+    "social": [
+        "social", "people", "employee", "employees", "workforce", "diversity", "inclusion",
+        "community", "communities", "human rights", "health and safety", "labor", "labour",
+        "wellbeing", "talent", "customers"
+    ],
+    "governance": [
+        "governance", "board", "ethics", "compliance", "risk", "remuneration", "compensation",
+        "audit", "shareholder", "shareholders", "anti-corruption", "bribery", "directors", "oversight"
+    ]
+}
+
+_CATEGORY_PATTERNS = {
+    category: re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE)
+    for category, terms in CATEGORY_TERMS.items()
+}
+# A section number ("2.", "2)", "2.1", "IV.") followed by a capitalised title; a bare
+# number or "I" would also match body lines such as "10 sites were certified"
+_NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)+\.?|\d+[.)]|[IVX]+[.)])\s+[A-Z]")
+_SMALL_WORDS = {"and", "of", "the", "for", "in", "on", "to", "a", "an", "our", "&"}
+
+
+class Section(NamedTuple):
+    """A heading-delimited span of the report text"""
+    title: str
+    category: Optional[str]
+    start: int
+    end: int
+    page: int
+
+
+class SectionIndex:
+    def __init__(self, text: str, sections: List[Section]):
+        """Sections of `text`, ordered by offset and covering it end to end"""
+        self.text = text
+        self.sections = sections
+        self._starts = [section.start for section in sections]
+
+    def for_category(self, category: str) -> List[Section]:
+        return [section for section in self.sections if section.category == category]
+
+    def text_for(self, category: str) -> str:
+        """Concatenated text of every section mapped to category"""
+        return "\n".join(self.text[s.start:s.end].strip() for s in self.for_category(category))
+
+    def category_at(self, offset: int) -> Optional[str]:
+        """Category of the section containing a character offset"""
+        i = bisect.bisect_right(self._starts, offset) - 1
+        return self.sections[i].category if i >= 0 else None
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [section._asdict() for section in self.sections]
+
+
+def is_heading(line: str) -> bool:
+    """Heuristic heading test: short, unpunctuated, numbered, capitalised or title-cased"""
+    line = line.strip()
+    words = line.split()
+    if not 1 <= len(words) <= 10 or len(line) > 80 or line[-1] in ".,;":
+        return False
+    if not (line[0].isupper() or line[0].isdigit()):
+        return False
+    if _NUMBERED_HEADING.match(line) or (line.isupper() and len(line) > 3):
+        return True
+    significant = [word for word in words if word.lower() not in _SMALL_WORDS]
+    capitalised = [word for word in significant if word[0].isupper() or word[0].isdigit()]
+    return len(words) >= 2 and bool(significant) and len(capitalised) == len(significant)
+
+
+def classify(text: str) -> Optional[str]:
+    """The E/S/G category whose vocabulary occurs most often in text, if any"""
+    counts = {category: len(pattern.findall(text)) for category, pattern in _CATEGORY_PATTERNS.items()}
+    category, count = max(counts.items(), key=lambda item: item[1])
+    return category if count else None
+
+
+def segment_document(pages: Dict[int, str], separator: str = " ") -> SectionIndex:
+    """Segment page texts joined with `separator`, as the API joins extracted pages
+
+    Lines are scanned once; every detected heading closes the previous
+    section. A section's category comes from its heading, or from its body
+    vocabulary when the heading is not ESG-specific.
+    """
+    text = separator.join(pages.values())
+    boundaries = []  # (offset, title, page)
+    offset = 0
+    for page_num, page_text in pages.items():
+        line_start = offset
+        for line in page_text.splitlines(keepends=True):
+            if is_heading(line):
+                boundaries.append((line_start, line.strip(), page_num))
+            line_start += len(line)
+        offset += len(page_text) + len(separator)
+
+    first_page = next(iter(pages), 0)
+    if not boundaries or boundaries[0][0] > 0:
+        boundaries.insert(0, (0, "", first_page))
+
+    sections = []
+    for i, (start, title, page_num) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(text)
+        category = classify(title) if title else None
+        if category is None:
+            category = classify(text[start:end])
+        sections.append(Section(title, category, start, end, page_num))
+    return SectionIndex(text, sections)
+
+
+def segment_text(text: str) -> SectionIndex:
+    """Segment text that has already been joined into one string"""
+    return segment_document({0: text})
@@ -0,0 +1,328 @@
+"""Bulk analysis of many reports into resumable JSON Lines output
+
+Run from the backend directory as `python -m api.batch reports/ -o results.jsonl`.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import threading
+import uuid
+from fastapi import HTTPException
+from api.pipeline import (
+    build_response, cache_key, cached_analysis, doc_processor, esg_analyzer, extract_document,
+    greenwashing_detector, model_executor, report_summarizer, result_cache
+)
+
+BATCH_SUFFIXES = (".pdf",)
+
+
+class BatchItem(NamedTuple):
+    id: str
+    path: str
+
+
+def collect_items(sources: Iterable[str], root: Optional[str] = None) -> List[BatchItem]:
+    """Reports named by directories, manifest files or individual report paths
+
+    A manifest lists one report per line, either as a path (relative to the
+    manifest) or as a JSON object with "path" and optional "id". Every report
+    path is resolved through symlinks and must have one of BATCH_SUFFIXES;
+    with root set, it must also resolve to somewhere below root.
+    """
+    root = os.path.realpath(root) if root is not None else None
+    items = []
+    for source in sources:
+        if os.path.isdir(source):
+            for walk_root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(BATCH_SUFFIXES):
+                        path = os.path.join(walk_root, name)
+                        items.append(BatchItem(os.path.relpath(path, source), path))
+        elif source.lower().endswith(BATCH_SUFFIXES):
+            items.append(BatchItem(os.path.basename(source), source))
+        else:
+            items.extend(_read_manifest(source))
+    items = [_resolve(item, root) for item in items]
+
+    seen = set()
+    for item in items:
+        if item.id in seen:
+            raise ValueError(f"Duplicate report id '{item.id}'")
+        seen.add(item.id)
+    return items
+
+
+def _resolve(item: BatchItem, root: Optional[str]) -> BatchItem:
+    """The item with its real path, checked against BATCH_SUFFIXES and root"""
+    path = os.path.realpath(item.path)
+    if not path.lower().endswith(BATCH_SUFFIXES):
+        raise ValueError(f"Unsupported report '{item.path}', expected one of {BATCH_SUFFIXES}")
+    if root is not None and os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Report '{item.path}' is outside the batch root")
+    return BatchItem(item.id, path)
+
+
+def _read_manifest(path: str) -> List[BatchItem]:
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                report_path = entry["path"]
+                report_id = entry.get("id") or report_path
+            else:
+                report_path = report_id = line
+            items.append(BatchItem(str(report_id), os.path.join(base, report_path)))
+    return items
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids already analyzed successfully in an existing results file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run; the report is analyzed again
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def drop_partial_line(path: str, block_size: int = 1 << 16):
+    """Truncate a results file after its last newline
+
+    An interrupted run can leave half a record at the end; appending to it
+    would glue the next record onto the fragment.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - block_size, 0)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            print(f"Dropping {end - position} bytes of an incomplete record from {path}")
+            f.truncate(position)
+
+
+class BatchRun:
+    def __init__(self, items: List[BatchItem], output_path: str, summary_mode: Optional[str] = None,
+                 group_size: Optional[int] = None, resume: bool = True, batch_id: Optional[str] = None):
+        """Analyze reports in groups, extracting the next group while the current one is scored
+
+        Each finished report is appended to output_path as one JSON line, so an
+        interrupted run resumes by skipping the ids already written there.
+        """
+        self.id = batch_id or uuid.uuid4().hex
+        self.items = items
+        self.output_path = output_path
+        self.summary_mode = report_summarizer.resolve_mode(summary_mode)
+        self.group_size = group_size or int(os.getenv("BATCH_GROUP_SIZE", 8))
+        self.resume = resume
+        self.status = "queued"
+        self.created_at = datetime.datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+        self.counts = {"total": len(items), "skipped": 0, "completed": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def run(self) -> Dict[str, int]:
+        self.status = "running"
+        try:
+            done = completed_ids(self.output_path) if self.resume else set()
+            pending = [item for item in self.items if item.id not in done]
+            self.counts["skipped"] = len(self.items) - len(pending)
+            groups = [pending[i:i + self.group_size] for i in range(0, len(pending), self.group_size)]
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+            if self.resume:
+                drop_partial_line(self.output_path)
+            mode = "a" if self.resume else "w"
+            with open(self.output_path, mode, encoding="utf-8") as out, \
+                    ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-extract") as extractor:
+                # Extraction of group N+1 overlaps with inference on group N
+                future: Optional[Future] = extractor.submit(self._prepare_group, groups[0]) if groups else None
+                for index in range(len(groups)):
+                    prepared = future.result()
+                    if index + 1 < len(groups):
+                        future = extractor.submit(self._prepare_group, groups[index + 1])
+                    for record in self._analyze_group(prepared):
+                        self._write(out, record)
+            self.status = "completed"
+        except Exception as e:
+            print(f"Batch {self.id} failed: {str(e)}")
+            self.status = "failed"
+            self.error = str(e)
+            raise
+        finally:
+            self.finished_at = datetime.datetime.now().isoformat()
+        return dict(self.counts)
+
+    def _prepare_group(self, group: List[BatchItem]) -> List[Dict[str, Any]]:
+        """Read and extract every report in a group, or pick up its cached analysis"""
+        return [self._prepare(item) for item in group]
+
+    def _prepare(self, item: BatchItem) -> Dict[str, Any]:
+        filename = os.path.basename(item.path)
+        try:
+            with open(item.path, "rb") as f:
+                content = f.read()
+            doc_hash = hashlib.sha256(content).hexdigest()
+            prepared = {
+                "item": item,
+                "filename": filename,
+                "file_size": len(content),
+                "doc_hash": doc_hash,
+                "document_type": filename.split('.')[-1].lower()
+            }
+            cached = cached_analysis(doc_hash, filename, self.summary_mode)
+            if cached is not None:
+                prepared["result"] = cached
+                return prepared
+
+            text, sections = extract_document(content, doc_hash, prepared["document_type"])
+            if not text or not text.strip():
+                raise ValueError("No text extracted")
+            prepared["text"] = text
+            prepared["sections"] = sections
+            return prepared
+        except Exception as e:
+            return {"item": item, "filename": filename, "error": _describe(e)}
+
+    def _analyze_group(self, prepared: List[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+        """Score a group's extracted reports, batching ESG classification across them"""
+        extracted = [p for p in prepared if "text" in p]
+        esg_results: Dict[int, Any] = {}
+        if extracted:
+            try:
+                scores = model_executor.call("esg", esg_analyzer.analyze_many, [p["text"] for p in extracted])
+                esg_results = {id(p): result for p, result in zip(extracted, scores)}
+            except Exception as e:
+                for p in extracted:
+                    p["error"] = _describe(e)
+
+        for p in prepared:
+            if "error" not in p and "result" not in p:
+                try:
+                    p["result"] = self._finish(p, esg_results[id(p)])
+                except Exception as e:
+                    p["error"] = _describe(e)
+
+            record = {"id": p["item"].id, "path": p["item"].path, "filename": p["filename"]}
+            if "error" in p:
+                record.update(status="error", error=p["error"])
+            else:
+                record.update(status="ok", report_hash=p["doc_hash"], result=p["result"])
+            yield record
+
+    def _finish(self, prepared: Dict[str, Any], esg_results: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the per-report stages and cache the assembled response"""
+        text, sections = prepared["text"], prepared["sections"]
+        greenwashing_results = model_executor.call(
+            "greenwashing", greenwashing_detector.analyze_text, text, sections
+        )
+        summary_results = model_executor.call(
+            "summarizer", report_summarizer.summarize, text, self.summary_mode, sections
+        )
+        response = build_response(
+            prepared["doc_hash"], prepared["filename"], prepared["file_size"], prepared["document_type"],
+            self.summary_mode, text, sections, esg_results, greenwashing_results, summary_results
+        )
+        result_cache.put(cache_key(prepared["doc_hash"], self.summary_mode), response)
+        return response
+
+    def _write(self, out, record: Dict[str, Any]):
+        """Append one result line and flush it, so it survives an interrupted run"""
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+        with self._lock:
+            self.counts["completed" if record["status"] == "ok" else "failed"] += 1
+        print(f"[{record['status']}] {record['id']}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "summary_mode": self.summary_mode,
+            "counts": counts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error)
+
+
+class BatchManager:
+    def __init__(self, root: str, workers: int = 1):
+        """Run batches on background threads, each writing into its own directory under root"""
+        self.root = root
+        self.runs: Dict[str, BatchRun] = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+
+    def run_dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    def submit(self, run: BatchRun) -> BatchRun:
+        self.runs[run.id] = run
+        self._executor.submit(run.run)
+        return run
+
+    def get(self, batch_id: str) -> Optional[BatchRun]:
+        return self.runs.get(batch_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Analyze many ESG reports into a JSON Lines file")
+    parser.add_argument("sources", nargs="+", help="report files, directories or manifest files")
+    parser.add_argument("-o", "--output", required=True, help="JSON Lines results file")
+    parser.add_argument("--summary-mode", choices=["abstractive", "extractive", "hybrid"])
+    parser.add_argument("--group-size", type=int, help="reports extracted and scored together")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    args = parser.parse_args(argv)
+
+    items = collect_items(args.sources)
+    run = BatchRun(items, args.output, summary_mode=args.summary_mode, group_size=args.group_size,
+                   resume=not args.no_resume)
+    try:
+        counts = run.run()
+    finally:
+        model_executor.shutdown()
+        doc_processor.shutdown()
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Model execution layer keeping blocking inference off the event loop"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import contextvars
+import os
+import threading
+import time
+import torch
+from ai.metrics import default_metrics
+
+MODEL_INFLIGHT = default_metrics.gauge(
+    "greenstamp_model_inflight", "Calls currently holding a model slot", ["model"]
+)
+MODEL_WAIT_SECONDS = default_metrics.histogram(
+    "greenstamp_model_wait_seconds", "Time spent waiting for a model slot", ["model"]
+)
+
+
+class ModelExecutor:
+    def __init__(self, workers: int, limits: Dict[str, int], torch_threads: Optional[int] = None):
+        """Run pipeline work on a sized thread pool with per-model concurrency limits
+
+        torch's intra-op thread pool is process wide, so a server running
+        several model slots at once can share the cores between them with
+        share_cores(); single-caller processes such as the batch CLI keep
+        torch's default of one thread per core.
+        """
+        self.workers = workers
+        self.limits = dict(limits)
+        self._slots = {model: threading.BoundedSemaphore(limit) for model, limit in self.limits.items()}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model")
+
+        cores = os.cpu_count() or 1
+        self.torch_threads = torch_threads or max(1, cores // max(1, sum(self.limits.values())))
+
+    def share_cores(self):
+        """Cap torch's intra-op threads so concurrently running models do not oversubscribe the cores"""
+        torch.set_num_threads(self.torch_threads)
+        print(f"Using {self.torch_threads} torch threads per model call")
+
+    @contextmanager
+    def limit(self, model: str):
+        """Hold one of the model's concurrency slots for the duration of the block"""
+        slot = self._slots[model]
+        start = time.perf_counter()
+        with slot:
+            MODEL_WAIT_SECONDS.observe(time.perf_counter() - start, model=model)
+            MODEL_INFLIGHT.inc(model=model)
+            try:
+                yield
+            finally:
+                MODEL_INFLIGHT.dec(model=model)
+
+    def call(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call fn synchronously while holding a slot for model"""
+        with self.limit(model):
+            return fn(*args, **kwargs)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run blocking fn on the executor without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. per-request state) into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool, lambda: context.run(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,136 @@
+"""Background analysis jobs with bounded concurrency and backpressure"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import datetime
+import functools
+import uuid
+from fastapi import HTTPException
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class Job:
+    def __init__(self, filename: str, content: bytes, doc_hash: str, stages: List[str],
+                 options: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.content = content
+        self.doc_hash = doc_hash
+        self.options = options or {}
+        self.status = "queued"
+        self.stages = {stage: {"status": "pending"} for stage in stages}
+        self.created_at = datetime.datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.error_status = 500
+
+    def update_stage(self, stage: str, status: str):
+        """Record stage progress; called from the worker thread"""
+        entry = self.stages.setdefault(stage, {})
+        entry["status"] = status
+        entry[f"{status}_at"] = datetime.datetime.now().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "report_hash": self.doc_hash,
+            "options": self.options,
+            "status": self.status,
+            "stages": self.stages,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error
+        }
+
+
+class JobManager:
+    def __init__(self, run: Callable[..., Dict[str, Any]], stages: List[str], workers: int = 2,
+                 max_queue: int = 16, retention: int = 1000):
+        """Run `run(content, doc_hash, filename, progress, **options)` for queued jobs on worker threads"""
+        self.run = run
+        self.stages = stages
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+
+    async def start(self):
+        """Start the worker tasks on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, filename: str, content: bytes, doc_hash: str, **options) -> Job:
+        """Queue a job, raising QueueFullError when the queue is at capacity"""
+        job = Job(filename, content, doc_hash, self.stages, options)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Analysis queue is full ({self.max_queue} jobs waiting)")
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def completed(self, filename: str, doc_hash: str, result: Dict[str, Any], **options) -> Job:
+        """Record a job that is answered without queueing, such as a cached analysis"""
+        job = Job(filename, b"", doc_hash, self.stages, options)
+        for stage in self.stages:
+            job.update_stage(stage, "cached")
+        job.result = result
+        job.status = "completed"
+        job.finished_at = datetime.datetime.now().isoformat()
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                run = functools.partial(
+                    self.run, job.content, job.doc_hash, job.filename, job.update_stage, **job.options
+                )
+                job.result = await loop.run_in_executor(self._executor, run)
+                job.status = "completed"
+            except HTTPException as e:
+                job.status = "failed"
+                job.error = str(e.detail)
+                job.error_status = e.status_code
+            except Exception as e:
+                print(f"Job {job.id} failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                # The upload is no longer needed once the job has run
+                job.content = b""
+                job.finished_at = datetime.datetime.now().isoformat()
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self.jobs) - self.retention)]:
+            del self.jobs[job_id]
@@ -1,17 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, Dict
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Any, List, Optional, Dict, Tuple
 import uvicorn
 import hashlib
 import asyncio
-import datetime
+import json
 import os
-from ai.document_processor import DocumentProcessor
-from ai.esg_analyzer import ESGAnalyzer
-from ai.greenwashing_detector import GreenwashingDetector
-from ai.report_summarizer import ReportSummarizer
+import shutil
+import uuid
+from api.pipeline import STAGES, analyze_document, cached_analysis, doc_processor, model_executor, result_cache
+from api.jobs import JobManager, QueueFullError
+from api.batch import BATCH_SUFFIXES, BatchItem, BatchManager, BatchRun, collect_items
+from ai.model_registry import default_registry
+from ai.metrics import default_metrics, profile_call, request_timings, timed
 from models.schemas import ESGScore
 
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# /batch uploads: each file is still held to MAX_UPLOAD_BYTES
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 100))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_MB", 200)) * 1024 * 1024
+# Comment lines sent on idle event streams so proxies do not time them out
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+SUMMARY_MODE_PATTERN = "^(abstractive|extractive|hybrid)$"
+# ?profile=true is honoured only when PROFILE_REQUESTS=1, since profiling slows the request down
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+
 app = FastAPI(
     title="GreenStamp API",
     description="AI + Blockchain-powered ESG Analysis Platform",
@@ -27,95 +43,189 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI components
-esg_analyzer = ESGAnalyzer()
-greenwashing_detector = GreenwashingDetector()
-report_summarizer = ReportSummarizer()
-doc_processor = DocumentProcessor()
+class UploadSizeLimit:
+    def __init__(self, app, max_bytes: int, paths: Tuple[str, ...], detail: str = "File too large"):
+        """Refuse oversized upload bodies on paths before they are parsed
+
+        Form parsing buffers the whole multipart body, spooling it to a
+        temporary file past 1MB, before an endpoint runs. Requests declaring a
+        larger Content-Length are refused outright, and bodies without one are
+        cut off once they pass the limit.
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+        self.detail = detail
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and (not length.isdigit() or int(length) > self.max_bytes):
+            response = JSONResponse(status_code=400, content={"detail": self.detail})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=400, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Multipart framing adds a little to the file itself
+app.add_middleware(UploadSizeLimit, max_bytes=MAX_UPLOAD_BYTES + 64 * 1024,
+                   paths=("/analyze", "/analyze/stream"))
+app.add_middleware(UploadSizeLimit, max_bytes=MAX_BATCH_UPLOAD_BYTES + 64 * 1024,
+                   paths=("/batch",), detail="Batch too large")
+
+# Background analysis jobs
+job_manager = JobManager(
+    analyze_document,
+    STAGES,
+    workers=int(os.getenv("JOB_WORKERS", 2)),
+    max_queue=int(os.getenv("JOB_QUEUE_SIZE", 16))
+)
+
+default_metrics.gauge("greenstamp_job_queue_depth", "Background jobs waiting for a worker").set_function(
+    lambda: job_manager.queue_depth
+)
+
+# Bulk analysis runs; uploads and results live under BATCH_DIR/<batch id>
+batch_manager = BatchManager(
+    os.getenv("BATCH_DIR", "/tmp/greenstamp/batches"),
+    workers=int(os.getenv("BATCH_WORKERS", 1))
+)
+# Server-side manifests and directories are only read from below this root
+BATCH_MANIFEST_ROOT = os.getenv("BATCH_MANIFEST_ROOT")
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Requests and jobs run models concurrently here, unlike the batch CLI
+    model_executor.share_cores()
+    await job_manager.start()
+
+@app.on_event("startup")
+async def preload_models():
+    # Models load lazily on first use; warm them in the background so startup is not blocked
+    if os.getenv("PRELOAD_MODELS", "1") != "0":
+        default_registry.preload(background=True)
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_manager.stop()
+    batch_manager.shutdown()
+    model_executor.shutdown()
+    doc_processor.shutdown()
+
+async def read_upload(file: UploadFile) -> Tuple[bytes, str]:
+    """Read a parsed upload in chunks, hashing as we go and stopping at the size limit
+
+    The chunks are joined into one bytes object, which PyMuPDF opens without
+    copying it again.
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=400, detail="File too large")
+
+    chunks = []
+    total = 0
+    digest = hashlib.sha256()
+    with timed("upload"):
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=400, detail="File too large")
+            digest.update(chunk)
+            chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to GreenStamp API"}
 
+@app.get("/ready")
+async def readiness():
+    body = {"ready": default_registry.ready, "models": default_registry.status()}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(default_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "results": result_cache.stats(),
+        "pages": doc_processor.page_cache.stats()
+    }
+
 @app.post("/analyze")
-async def analyze_report(file: UploadFile = File(...)):
+async def analyze_report(file: UploadFile = File(...), background: bool = Query(False),
+                         summary_mode: Optional[str] = Query(None, pattern=SUMMARY_MODE_PATTERN),
+                         profile: bool = Query(False)):
+    if profile and not PROFILE_REQUESTS:
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
+    # Stage timings, from the upload on, are collected for this request
+    with request_timings():
+        return await _analyze_report(file, background, summary_mode, profile)
+
+async def _analyze_report(file: UploadFile, background: bool, summary_mode: Optional[str], profile: bool):
     try:
         print(f"Received file: {file.filename}")
         print(f"File content type: {file.content_type}")
         
-        # Check file size
-        content = await file.read()
-        file_size = len(content)
-        print(f"File size: {file_size} bytes")
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="File too large")
-
-        # Create temporary file
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_dir = "/tmp/greenstamp"
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_file = os.path.join(temp_dir, f"{timestamp}_{file.filename}")
-        print(f"Saving file to: {temp_file}")
-        
-        try:
-            # Save file
-            with open(temp_file, "wb") as f:
-                f.write(content)
-            print("File saved successfully")
-
-            # Extract text
-            print("Starting text extraction...")
-            text_results = doc_processor.extract_text(temp_file)
-            text = " ".join(text_results.values())
-            print(f"Extracted text length: {len(text)} characters")
-            
-            if not text or not text.strip():
-                raise HTTPException(status_code=400, detail="No text extracted")
-            
-            # Analyze ESG content
-            print("Starting ESG analysis...")
-            esg_results = esg_analyzer.analyze_text(text)
-            print("ESG analysis completed")
-            
-            # Generate summary
-            print("Generating summary...")
-            summary_results = report_summarizer.summarize(text)
-            print("Summary generated")
-            
-            # Calculate document hash
-            doc_hash = hashlib.sha256(content).hexdigest()
-            print(f"Document hash: {doc_hash}")
-            
-            # Create response
-            response = {
-                "environmental": float(esg_results["scores"]["environmental"]),
-                "social": float(esg_results["scores"]["social"]),
-                "governance": float(esg_results["scores"]["governance"]),
-                "total": float(esg_results["scores"]["total"]),
-                "report_hash": doc_hash,
-                "analysis": {
-                    "scores": esg_results["scores"],
-                    "category_details": esg_results["category_details"],
-                    "summary": summary_results,
-                    "text_excerpt": text[:1000] + "..." if len(text) > 1000 else text,
-                    "metadata": {
-                        "filename": file.filename,
-                        "file_size": str(file_size),
-                        "analyzed_at": datetime.datetime.now().isoformat(),
-                        "document_type": file.filename.split('.')[-1].lower(),
-                        "model_version": "esg-analyzer-v1"
-                    }
-                }
-            }
-            print("Response created successfully")
+        # Oversized bodies were refused by UploadSizeLimit before the form was parsed
+        content, doc_hash = await read_upload(file)
+        print(f"File size: {len(content)} bytes")
+        print(f"Document hash: {doc_hash}")
+
+        # Repeat uploads are answered here, without waiting for a worker or a queue slot
+        cached = await asyncio.to_thread(cached_analysis, doc_hash, file.filename, summary_mode)
+
+        if background:
+            try:
+                if cached is not None:
+                    job = job_manager.completed(file.filename, doc_hash, cached, summary_mode=summary_mode)
+                else:
+                    job = job_manager.submit(file.filename, content, doc_hash, summary_mode=summary_mode)
+            except QueueFullError as e:
+                raise HTTPException(status_code=429, detail=str(e))
+            print(f"Queued job {job.id}")
+            body = job.to_dict()
+            body["status_url"] = f"/jobs/{job.id}"
+            body["result_url"] = f"/jobs/{job.id}/result"
+            return JSONResponse(status_code=202, content=body)
+
+        if cached is not None:
+            with request_timings() as timings:
+                cached["analysis"]["metadata"].update(timings.to_metadata())
+            return cached
+
+        # Inference runs on the model executor so / and health checks stay responsive
+        if profile:
+            response, profiler, report = await model_executor.run(
+                profile_call, analyze_document, content, doc_hash, file.filename,
+                summary_mode=summary_mode, check_cache=False
+            )
+            response["analysis"]["metadata"].update(profiler=profiler, profile=report)
             return response
-            
-        finally:
-            # Clean up
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-                print("Temporary file cleaned up")
+        return await model_executor.run(
+            analyze_document, content, doc_hash, file.filename, summary_mode=summary_mode, check_cache=False
+        )
                 
     except HTTPException as e:
         print(f"HTTP Exception: {str(e)}")
@@ -124,5 +234,165 @@ async def analyze_report(file: UploadFile = File(...)):
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze/stream")
+async def analyze_report_stream(file: UploadFile = File(...),
+                                summary_mode: Optional[str] = Query(None, pattern=SUMMARY_MODE_PATTERN)):
+    """Analyze a report, streaming stage progress and partial results as Server-Sent Events
+
+    Events are "accepted", "stage", "page", "scores", "greenwashing" and
+    "summary" as they happen, then a final "result" or "error".
+    """
+    print(f"Received file for streaming analysis: {file.filename}")
+
+    # The pipeline runs on executor threads; events cross back to the loop through the queue
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def progress(stage: str, status: str):
+        emit("stage", {"stage": stage, "status": status})
+
+    # The pipeline task copies this context, so its timings include the upload
+    with request_timings():
+        content, doc_hash = await read_upload(file)
+        print(f"File size: {len(content)} bytes")
+        cached = await asyncio.to_thread(cached_analysis, doc_hash, file.filename, summary_mode)
+        if cached is not None:
+            for stage in STAGES:
+                progress(stage, "cached")
+            task = loop.create_future()
+            task.set_result(cached)
+        else:
+            task = asyncio.ensure_future(model_executor.run(
+                analyze_document, content, doc_hash, file.filename,
+                progress=progress, summary_mode=summary_mode, emit=emit, check_cache=False
+            ))
+    # Scheduled after every event the pipeline emitted before returning
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    async def stream():
+        yield sse_event("accepted", {"filename": file.filename, "report_hash": doc_hash, "stages": STAGES})
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield sse_event(*item)
+
+        try:
+            result = task.result()
+        except HTTPException as e:
+            print(f"HTTP Exception: {str(e)}")
+            yield sse_event("error", {"status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            yield sse_event("error", {"status_code": 500, "detail": str(e)})
+            return
+        yield sse_event("result", result)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/batch")
+async def analyze_batch(files: Optional[List[UploadFile]] = File(None), manifest: Optional[str] = Form(None),
+                        summary_mode: Optional[str] = Query(None, pattern=SUMMARY_MODE_PATTERN)):
+    """Queue a bulk analysis of uploaded reports or of a server-side directory or manifest"""
+    if not files and not manifest:
+        raise HTTPException(status_code=400, detail="Provide files or a manifest")
+    files = files or []
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_FILES} files per batch")
+    names = [os.path.basename(file.filename or "") for file in files]
+    for file, name in zip(files, names):
+        if not name.lower().endswith(BATCH_SUFFIXES):
+            raise HTTPException(status_code=400, detail=f"Unsupported file: {file.filename}")
+
+    items: List[BatchItem] = []
+    if manifest:
+        if not BATCH_MANIFEST_ROOT:
+            raise HTTPException(status_code=403, detail="Manifest batches are disabled")
+        root = os.path.realpath(BATCH_MANIFEST_ROOT)
+        path = os.path.realpath(os.path.join(root, manifest))
+        if os.path.commonpath([root, path]) != root or not os.path.exists(path):
+            raise HTTPException(status_code=400, detail="Manifest not found")
+        try:
+            items.extend(collect_items([path], root=root))
+        except (OSError, ValueError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid manifest: {str(e)}")
+
+    # The run directory is only created once the request has been validated, and
+    # removed again if an upload turns out to be too large
+    batch_id = uuid.uuid4().hex
+    run_dir = batch_manager.run_dir(batch_id)
+    try:
+        # Uploads are spooled to disk so large batches are not held in memory
+        if files:
+            input_dir = os.path.join(run_dir, "inputs")
+            os.makedirs(input_dir, exist_ok=True)
+        for index, (file, name) in enumerate(zip(files, names)):
+            content, _ = await read_upload(file)
+            path = os.path.join(input_dir, f"{index:05d}-{name}")
+            with open(path, "wb") as f:
+                f.write(content)
+            items.append(BatchItem(f"{index:05d}-{name}", path))
+
+        try:
+            run = BatchRun(items, os.path.join(run_dir, "results.jsonl"), summary_mode=summary_mode,
+                           batch_id=batch_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        raise
+    batch_manager.submit(run)
+    print(f"Queued batch {batch_id} with {len(items)} reports")
+    body = run.to_dict()
+    body["status_url"] = f"/batch/{batch_id}"
+    body["results_url"] = f"/batch/{batch_id}/results"
+    return JSONResponse(status_code=202, content=body)
+
+@app.get("/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    run = batch_manager.get(batch_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return run.to_dict()
+
+@app.get("/batch/{batch_id}/results")
+async def batch_results(batch_id: str):
+    """Results written so far, one JSON object per line"""
+    run = batch_manager.get(batch_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if not os.path.exists(run.output_path):
+        return JSONResponse(status_code=202, content=run.to_dict())
+    return FileResponse(run.output_path, media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    body = job.to_dict()
+    body["queue_depth"] = job_manager.queue_depth
+    return body
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    if job.status != "completed":
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return job.result
+
 if __name__ == "__main__":
     uvicorn.run("api.main:app", host="0.0.0.0", port=8002, reload=True)
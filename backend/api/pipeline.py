@@ -0,0 +1,244 @@
+"""Analysis pipeline shared by the synchronous and background /analyze paths"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import datetime
+import hashlib
+import itertools
+import json
+import os
+from fastapi import HTTPException
+from ai.document_processor import DocumentProcessor, PageProgressCallback
+from ai.esg_analyzer import ESGAnalyzer
+from ai.greenwashing_detector import GreenwashingDetector
+from ai.report_summarizer import ReportSummarizer
+from ai.disk_cache import DiskLRUCache
+from ai.metrics import default_metrics, request_timings, timed
+from ai.section_segmenter import SectionIndex, segment_document
+from api.executor import ModelExecutor
+
+# Bump when a code change alters the response; configuration changes are hashed in below
+RESPONSE_FORMAT = "esg-analyzer-v3"
+STAGES = ["extraction", "esg_analysis", "greenwashing", "summarization"]
+
+# Called with (stage, status) as the pipeline moves through STAGES
+ProgressCallback = Callable[[str, str], None]
+# Called with (event, data) as partial results become available: "page" as each
+# page's text is extracted, "scores", "greenwashing" and one "summary" per summary piece
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+# Initialize AI components
+esg_analyzer = ESGAnalyzer()
+greenwashing_detector = GreenwashingDetector()
+report_summarizer = ReportSummarizer()
+doc_processor = DocumentProcessor()
+
+
+def _model_version() -> str:
+    """Version of the analysis output, derived from every component's configuration
+
+    Changing a model, inference backend, head weights, lexicon or OCR engine
+    changes the version, so results cached under the old settings are not served.
+    """
+    config = {
+        "extraction": doc_processor.config(),
+        "esg": esg_analyzer.config(),
+        "greenwashing": greenwashing_detector.config(),
+        "summarizer": report_summarizer.config()
+    }
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{RESPONSE_FORMAT}-{digest[:12]}"
+
+
+MODEL_VERSION = _model_version()
+
+# Blocking inference runs here, at most MODEL_LIMIT_* calls per model at a time
+model_executor = ModelExecutor(
+    workers=int(os.getenv("ANALYSIS_WORKERS", 4)),
+    limits={
+        "ocr": int(os.getenv("MODEL_LIMIT_OCR", 1)),
+        "esg": int(os.getenv("MODEL_LIMIT_ESG", 1)),
+        "greenwashing": int(os.getenv("MODEL_LIMIT_GREENWASHING", 1)),
+        "summarizer": int(os.getenv("MODEL_LIMIT_SUMMARIZER", 1))
+    },
+    torch_threads=int(os.getenv("MODEL_TORCH_THREADS", 0)) or None
+)
+
+# Analysis results keyed by report SHA-256 and model version
+result_cache = DiskLRUCache(
+    os.getenv("RESULT_CACHE_PATH", "/tmp/greenstamp/results.sqlite3"),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_MB", 512)) * 1024 * 1024
+)
+
+# Cache effectiveness, read from the caches' own counters at scrape time
+_cache_hit_ratio = default_metrics.gauge("greenstamp_cache_hit_ratio", "Cache hits over lookups", ["cache"])
+_cache_entries = default_metrics.gauge("greenstamp_cache_entries", "Entries held in each cache", ["cache"])
+for _name, _cache in (("results", result_cache), ("pages", doc_processor.page_cache)):
+    _cache_hit_ratio.set_function(lambda cache=_cache: cache.stats()["hit_rate"], cache=_name)
+    _cache_entries.set_function(lambda cache=_cache: cache.stats()["entries"], cache=_name)
+
+
+def _noop_progress(stage: str, status: str):
+    pass
+
+
+def _noop_event(event: str, data: Dict[str, Any]):
+    pass
+
+
+def cache_key(doc_hash: str, summary_mode: str) -> str:
+    return f"{doc_hash}:{MODEL_VERSION}:{summary_mode}"
+
+
+def cached_analysis(doc_hash: str, filename: str, summary_mode: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return a previously computed analysis for this report, if any
+
+    This is a single SQLite read, cheap enough to run before work is handed
+    to the model executor or the job queue.
+    """
+    summary_mode = report_summarizer.resolve_mode(summary_mode)
+    cached = result_cache.get(cache_key(doc_hash, summary_mode))
+    if cached is not None:
+        print("Returning cached analysis")
+        metadata = cached["analysis"]["metadata"]
+        metadata["filename"] = filename
+        metadata["cache"] = "hit"
+    return cached
+
+
+def extract_document(content: bytes, doc_hash: str, document_type: str,
+                     page_progress: Optional[PageProgressCallback] = None) -> Tuple[str, SectionIndex]:
+    """Extract a report's text and build its E/S/G section index"""
+    with timed("extraction"):
+        text_results = model_executor.call(
+            "ocr", doc_processor.extract_text, content, doc_hash=doc_hash, filetype=document_type,
+            progress=page_progress
+        )
+    text = " ".join(text_results.values())
+    # One pass over the pages gives the E/S/G section index reused by later stages
+    sections = segment_document(text_results, separator=" ")
+    return text, sections
+
+
+def build_response(doc_hash: str, filename: str, file_size: int, document_type: str, summary_mode: str,
+                   text: str, sections: SectionIndex, esg_results: Dict[str, Any],
+                   greenwashing_results: Dict[str, Any], summary_results: Dict[str, Any]) -> Dict[str, Any]:
+    """Assemble the /analyze response from the stage results"""
+    return {
+        "environmental": float(esg_results["scores"]["environmental"]),
+        "social": float(esg_results["scores"]["social"]),
+        "governance": float(esg_results["scores"]["governance"]),
+        "total": float(esg_results["scores"]["total"]),
+        "report_hash": doc_hash,
+        "analysis": {
+            "scores": esg_results["scores"],
+            "category_details": esg_results["category_details"],
+            "greenwashing_warnings": greenwashing_results["indicators"],
+            "greenwashing_risk_score": greenwashing_results["risk_score"],
+            "summary": summary_results,
+            "sections": sections.to_list(),
+            "text_excerpt": text[:1000] + "..." if len(text) > 1000 else text,
+            "metadata": {
+                "filename": filename,
+                "file_size": str(file_size),
+                "analyzed_at": datetime.datetime.now().isoformat(),
+                "document_type": document_type,
+                "model_version": MODEL_VERSION,
+                "summary_mode": summary_mode
+            }
+        }
+    }
+
+
+def analyze_document(content: bytes, doc_hash: str, filename: str,
+                     progress: Optional[ProgressCallback] = None,
+                     summary_mode: Optional[str] = None,
+                     emit: Optional[EventCallback] = None,
+                     check_cache: bool = True) -> Dict[str, Any]:
+    """Run extraction, ESG scoring and summarization on an uploaded report
+
+    Stage timings for the request are added to the response metadata as
+    "<stage>_seconds" entries; they are not part of the cached result.
+    Callers that have just missed in cached_analysis pass check_cache=False
+    so the miss is not looked up, and counted, a second time.
+    """
+    with request_timings() as timings:
+        response = _analyze_document(content, doc_hash, filename, progress, summary_mode, emit, check_cache)
+        response["analysis"]["metadata"].update(timings.to_metadata())
+    return response
+
+
+def _analyze_document(content: bytes, doc_hash: str, filename: str,
+                      progress: Optional[ProgressCallback], summary_mode: Optional[str],
+                      emit: Optional[EventCallback], check_cache: bool) -> Dict[str, Any]:
+    progress = progress or _noop_progress
+    summary_mode = report_summarizer.resolve_mode(summary_mode)
+
+    # Per-page progress is only collected for callers that stream events
+    page_progress = None
+    if emit is not None:
+        # Pages can finish on the OCR thread and the calling thread concurrently
+        pages_done = itertools.count(1)
+        page_progress = lambda page, pages, method: emit("page", {
+            "page": page, "pages": pages, "method": method, "completed": next(pages_done)
+        })
+    else:
+        emit = _noop_event
+
+    cached = cached_analysis(doc_hash, filename, summary_mode) if check_cache else None
+    if cached is not None:
+        for stage in STAGES:
+            progress(stage, "cached")
+        return cached
+
+    document_type = filename.split('.')[-1].lower()
+
+    # Extract text straight from the in-memory upload
+    print("Starting text extraction...")
+    progress("extraction", "running")
+    text, sections = extract_document(content, doc_hash, document_type, page_progress)
+    progress("extraction", "completed")
+    print(f"Extracted text length: {len(text)} characters")
+    
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="No text extracted")
+    
+    # Analyze ESG content
+    print("Starting ESG analysis...")
+    progress("esg_analysis", "running")
+    with timed("esg_analysis"):
+        esg_results = model_executor.call("esg", esg_analyzer.analyze_text, text)
+    progress("esg_analysis", "completed")
+    print("ESG analysis completed")
+    emit("scores", {"scores": esg_results["scores"], "category_details": esg_results["category_details"]})
+
+    # Detect greenwashing
+    print("Starting greenwashing detection...")
+    progress("greenwashing", "running")
+    with timed("greenwashing"):
+        greenwashing_results = model_executor.call(
+            "greenwashing", greenwashing_detector.analyze_text, text, sections
+        )
+    progress("greenwashing", "completed")
+    emit("greenwashing", {
+        "greenwashing_warnings": greenwashing_results["indicators"],
+        "greenwashing_risk_score": greenwashing_results["risk_score"]
+    })
+    print(f"Greenwashing detection completed: {len(greenwashing_results['indicators'])} warnings")
+    
+    # Generate summary
+    print("Generating summary...")
+    progress("summarization", "running")
+    with timed("summarization"):
+        summary_results = model_executor.call(
+            "summarizer", report_summarizer.summarize, text, summary_mode, sections,
+            lambda piece, value: emit("summary", {"piece": piece, "value": value})
+        )
+    progress("summarization", "completed")
+    print("Summary generated")
+    
+    # Create response
+    response = build_response(doc_hash, filename, len(content), document_type, summary_mode,
+                              text, sections, esg_results, greenwashing_results, summary_results)
+    result_cache.put(cache_key(doc_hash, summary_mode), response)
+    print("Response created successfully")
+    return response
@@ -0,0 +1,48 @@
+"""Benchmark per-report ESG scoring against cross-document batching with analyze_many
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_corpus_scoring --reports 100
+"""
+
+import argparse
+import time
+
+from ai.esg_analyzer import ESGAnalyzer
+from benchmarks.sample_reports import sample_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--model", default="roberta-base")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-paragraphs", type=int, default=40,
+                        help="report length varies between 1 and this many paragraphs")
+    args = parser.parse_args()
+
+    reports = sample_reports(args.reports, min_paragraphs=1, max_paragraphs=args.max_paragraphs)
+    analyzer = ESGAnalyzer(model_name=args.model, batch_size=args.batch_size)
+    analyzer.analyze_text(reports[0])  # warm-up
+
+    start = time.perf_counter()
+    single = [analyzer.analyze_text(report) for report in reports]
+    per_report_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    many = analyzer.analyze_many(reports)
+    corpus_s = time.perf_counter() - start
+
+    drift = max(
+        abs(a["scores"][category] - b["scores"][category])
+        for a, b in zip(single, many) for category in ("environmental", "social", "governance")
+    )
+    chunks = sum(result["coverage"]["chunks_scored"] for result in many)
+    print(f"{len(reports)} reports, {chunks} chunks, model={args.model}, batch_size={args.batch_size}")
+    print(f"  analyze_text loop: {per_report_s:8.2f} s ({len(reports) / per_report_s:6.2f} reports/s)")
+    print(f"       analyze_many: {corpus_s:8.2f} s ({len(reports) / corpus_s:6.2f} reports/s)")
+    print(f"speed-up: {per_report_s / corpus_s:.2f}x, max score drift: {drift:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the legacy three-pipeline ESG scoring against the shared-encoder analyzer
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_esg_scoring --reports 20
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+import torch
+from transformers import pipeline
+
+from ai.esg_analyzer import ESGAnalyzer
+from benchmarks.sample_reports import load_corpus
+
+
+def count_parameters(models: List[torch.nn.Module]) -> int:
+    """Count unique parameters across models"""
+    seen = {}
+    for model in models:
+        for param in model.parameters():
+            seen[id(param)] = param.numel()
+    return sum(seen.values())
+
+
+def time_corpus(score: Callable[[str], object], reports: List[str]) -> Dict[str, float]:
+    """Score every report once and return wall-clock statistics"""
+    score(reports[0])  # warm-up
+    timings = []
+    for report in reports:
+        start = time.perf_counter()
+        score(report)
+        timings.append(time.perf_counter() - start)
+    return {
+        "total_s": sum(timings),
+        "mean_s": sum(timings) / len(timings),
+        "reports_per_s": len(timings) / sum(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of .txt reports (default: synthetic corpus)")
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--model", default="roberta-base")
+    parser.add_argument("--max-chunks", type=int, default=1,
+                        help="windows scored per report by the shared encoder (1 matches the legacy truncation)")
+    args = parser.parse_args()
+
+    reports = load_corpus(args.corpus, args.reports)
+    analyzer = ESGAnalyzer(model_name=args.model, max_chunks=args.max_chunks)
+
+    # The previous implementation: one pipeline per category, each run on the full text
+    legacy = [
+        pipeline("text-classification", model=args.model, return_all_scores=True)
+        for _ in range(3)
+    ]
+
+    def legacy_score(text: str):
+        processed = analyzer._preprocess_text(text)
+        return [p(processed, truncation=True)[0] for p in legacy]
+
+    results = {
+        "three_pipelines": time_corpus(legacy_score, reports),
+        "shared_encoder": time_corpus(analyzer.analyze_text, reports),
+    }
+    results["three_pipelines"]["parameters"] = count_parameters([p.model for p in legacy])
+    results["shared_encoder"]["parameters"] = count_parameters([analyzer.model])
+
+    print(f"{len(reports)} reports, model={args.model}, max_chunks={args.max_chunks}")
+    for name, stats in results.items():
+        print(f"{name:>16}: {stats['mean_s'] * 1000:8.1f} ms/report "
+              f"{stats['reports_per_s']:6.2f} reports/s "
+              f"{stats['parameters'] / 1e6:7.1f}M params")
+    speedup = results["three_pipelines"]["mean_s"] / results["shared_encoder"]["mean_s"]
+    print(f"speed-up: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Compare torch, int8 and ONNX inference backends on held-out report chunks
+
+Reports latency per backend and score drift against fp32 torch, and exits
+non-zero when drift exceeds the tolerance. From the backend directory:
+
+    python -m benchmarks.bench_inference_backends --backends torch int8 onnx --tolerance 0.05
+"""
+
+import argparse
+import copy
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+import torch
+
+from ai.esg_analyzer import ESG_CATEGORIES, ESGAnalyzer
+from ai.greenwashing_detector import GreenwashingDetector
+from ai.inference_backends import INFERENCE_BACKENDS, NamedOutputModel, load_inference_model
+from ai.model_registry import ModelRegistry
+from benchmarks.sample_reports import sample_reports
+
+
+def held_out_chunks(path: str, count: int) -> List[str]:
+    """Chunks from a file (one per line) or paragraphs of an unseen synthetic corpus"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:count]
+    paragraphs = [p for report in sample_reports(count=10, seed=1234) for p in report.split("\n\n")]
+    return paragraphs[:count]
+
+
+class EsgComponent:
+    """E/S/G heads; every backend is built from one fp32 model so they share the same heads"""
+
+    def __init__(self):
+        self.analyzer = ESGAnalyzer(registry=ModelRegistry(), inference_backend="torch")
+        self.fp32 = self.analyzer.model
+        self.output_names = ESG_CATEGORIES
+
+    def score(self, model: NamedOutputModel, chunks: List[str], batch_size: int) -> np.ndarray:
+        tokenizer = self.analyzer.tokenizer
+        outputs = []
+        for i in range(0, len(chunks), batch_size):
+            ids = [tokenizer(self.analyzer._preprocess_text(c), add_special_tokens=False)["input_ids"]
+                   [:self.analyzer.chunk_tokens] for c in chunks[i:i + batch_size]]
+            encoded = tokenizer.pad(
+                {"input_ids": [tokenizer.build_inputs_with_special_tokens(chunk) for chunk in ids]},
+                padding=True, return_tensors="pt"
+            )
+            with torch.inference_mode():
+                logits = model(encoded["input_ids"], encoded["attention_mask"])
+            outputs.append(np.concatenate(
+                [torch.softmax(logits[c], dim=-1).numpy() for c in self.output_names], axis=1
+            ))
+        return np.concatenate(outputs)
+
+
+class GreenwashingComponent:
+    """Sentiment classifier used to score greenwashing indicator contexts"""
+
+    def __init__(self):
+        self.detector = GreenwashingDetector(registry=ModelRegistry(), inference_backend="torch", mode="phrase")
+        self.fp32 = self.detector.classifier
+        self.output_names = ["logits"]
+
+    def score(self, model: NamedOutputModel, chunks: List[str], batch_size: int) -> np.ndarray:
+        outputs = []
+        for i in range(0, len(chunks), batch_size):
+            encoded = self.detector.tokenizer(chunks[i:i + batch_size], padding=True, truncation=True,
+                                              return_tensors="pt")
+            with torch.inference_mode():
+                logits = model(encoded["input_ids"], encoded["attention_mask"])["logits"]
+            outputs.append(torch.softmax(logits, dim=-1).numpy())
+        return np.concatenate(outputs)
+
+
+COMPONENTS = {"esg": EsgComponent, "greenwashing": GreenwashingComponent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks-file", help="held-out chunks, one per line")
+    parser.add_argument("--chunks", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS), choices=INFERENCE_BACKENDS)
+    parser.add_argument("--components", nargs="+", default=list(COMPONENTS), choices=list(COMPONENTS))
+    parser.add_argument("--tolerance", type=float, default=0.05, help="max allowed absolute probability drift")
+    args = parser.parse_args()
+
+    chunks = held_out_chunks(args.chunks_file, args.chunks)
+    failed = False
+
+    for name in args.components:
+        reference = None
+        print(f"{name}: {len(chunks)} chunks")
+        component = COMPONENTS[name]()
+        # Quantize and export copies of the one fp32 model, into a fresh ONNX directory,
+        # so drift measures the backend and not a different set of weights
+        with tempfile.TemporaryDirectory(prefix="onnx-bench-") as onnx_dir:
+            for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+                model = load_inference_model(backend, lambda: copy.deepcopy(component.fp32), component.output_names,
+                                             onnx_name=name, cache_dir=onnx_dir)
+                component.score(model, chunks[:args.batch_size], args.batch_size)  # warm-up
+                start = time.perf_counter()
+                probs = component.score(model, chunks, args.batch_size)
+                elapsed = time.perf_counter() - start
+
+                if reference is None:
+                    reference = probs
+                drift = np.abs(probs - reference)
+                agreement = float(np.mean(probs.argmax(axis=1) == reference.argmax(axis=1)))
+                ok = drift.max() <= args.tolerance
+                failed |= not ok
+                print(f"  {backend:>6}: {elapsed / len(chunks) * 1000:7.2f} ms/chunk "
+                      f"max drift {drift.max():.4f} mean drift {drift.mean():.4f} "
+                      f"top-label agreement {agreement:.3f} {'ok' if ok else 'FAIL'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark key point extraction: per-sentence zero-shot pipeline vs batched NLI pairs
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_key_points --sentences 40
+"""
+
+import argparse
+import time
+
+from nltk.tokenize import sent_tokenize
+
+from ai.report_summarizer import ReportSummarizer, KEY_POINT_CATEGORIES
+from benchmarks.sample_reports import sample_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=40, help="sentences scored by both paths")
+    args = parser.parse_args()
+
+    summarizer = ReportSummarizer()
+    text = " ".join(sample_reports(count=3))
+    sentences = sent_tokenize(text)[:args.sentences]
+    summarizer.key_point_max_sentences = len(sentences)
+
+    # Previous implementation: one pipeline call (7 forward passes) per sentence
+    start = time.perf_counter()
+    for sentence in sentences:
+        summarizer.key_points_extractor(sentence, KEY_POINT_CATEGORIES, multi_label=True)
+    before = len(sentences) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    summarizer._score_key_points(sentences, KEY_POINT_CATEGORIES)
+    after = len(sentences) / (time.perf_counter() - start)
+
+    # Full extraction including the cue-based pre-filter and per-report cap
+    full_text = " ".join(sample_reports(count=10))
+    total = len(sent_tokenize(full_text))
+    summarizer.key_point_max_sentences = 96
+    start = time.perf_counter()
+    summarizer._extract_key_points(full_text)
+    end_to_end = total / (time.perf_counter() - start)
+
+    print(f"per-sentence pipeline: {before:8.2f} sentences/s")
+    print(f"batched NLI pairs:     {after:8.2f} sentences/s ({after / before:.1f}x)")
+    print(f"with pre-filter+cap:   {end_to_end:8.2f} input sentences/s over {total} sentences")
+
+
+if __name__ == "__main__":
+    main()
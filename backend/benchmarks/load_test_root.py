@@ -0,0 +1,73 @@
+"""Measure GET / latency while several analyses are in flight
+
+Runs against the app in-process by default, or a live server with --url.
+Requires httpx. From the backend directory:
+
+    python -m benchmarks.load_test_root --analyses 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import time
+import uuid
+from typing import List
+
+import httpx
+import numpy as np
+
+from benchmarks.sample_reports import sample_pdf
+
+
+async def probe_root(client: httpx.AsyncClient, analyses: List[asyncio.Task], interval: float) -> List[float]:
+    """Poll GET / until every analysis has finished, recording latencies in seconds"""
+    latencies = []
+    while not all(task.done() for task in analyses):
+        start = time.perf_counter()
+        response = await client.get("/")
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args):
+    if args.url:
+        lifespan = contextlib.nullcontext()
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        from api.main import app
+        # ASGITransport sends no lifespan events, so run the startup and shutdown
+        # hooks here so the job workers and executor thread settings match a served app
+        lifespan = app.router.lifespan_context(app)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None)
+
+    async with lifespan, client:
+        analyses = []
+        for i in range(args.analyses):
+            pdf = sample_pdf(pages=args.pages, seed=i, nonce=uuid.uuid4().hex)
+            files = {"file": (f"report_{i}.pdf", pdf, "application/pdf")}
+            analyses.append(asyncio.create_task(client.post("/analyze", files=files)))
+
+        started = time.perf_counter()
+        latencies = await probe_root(client, analyses, args.interval)
+        elapsed = time.perf_counter() - started
+        statuses = [task.result().status_code for task in analyses]
+
+    ms = np.array(latencies) * 1000
+    print(f"{args.analyses} analyses of {args.pages} pages finished in {elapsed:.1f}s, statuses={statuses}")
+    print(f"GET / over {len(ms)} probes: p50={np.percentile(ms, 50):.1f}ms "
+          f"p99={np.percentile(ms, 99):.1f}ms max={ms.max():.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--analyses", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between GET / probes")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Reproducible benchmark suite for the ESG analysis pipeline
+
+Generates synthetic PDFs (native text, scanned and mixed, 10/100/300 pages),
+times DocumentProcessor, ESGAnalyzer, GreenwashingDetector and
+ReportSummarizer on their own and the whole pipeline through POST /analyze,
+and writes throughput, latency percentiles and peak RSS to a JSON file that
+can be diffed between commits. Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks --output benchmarks/results/current.json
+    python -m benchmarks.run_benchmarks --quick --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.sample_reports import PDF_KINDS, sample_pdf
+
+COMPONENTS = ("extraction", "esg", "greenwashing", "summarization", "end_to_end")
+PERCENTILES = (50, 90, 95, 99)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss_mb() -> float:
+    """Peak RSS of the process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+class RSSSampler:
+    """Samples RSS on a background thread to find the peak within one benchmark case"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_mb = current_rss_mb() or 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb() or 0.0)
+
+    def __enter__(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb() or 0.0)
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies)
+    stats = {"mean": float(values.mean()), "min": float(values.min()), "max": float(values.max())}
+    for p in PERCENTILES:
+        stats[f"p{p}"] = float(np.percentile(values, p))
+    return {key: round(value, 4) for key, value in stats.items()}
+
+
+def measure(run: Callable[[int], Any], repeats: int, pages: int) -> Dict[str, Any]:
+    """Time `run(repeat)` repeats times, tracking the RSS peak across the runs"""
+    latencies = []
+    with RSSSampler() as rss:
+        for repeat in range(repeats):
+            start = time.perf_counter()
+            run(repeat)
+            latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    return {
+        "repeats": repeats,
+        "latency_s": summarize_latencies(latencies),
+        "throughput": {
+            "documents_per_s": round(repeats / total, 4),
+            "pages_per_s": round(repeats * pages / total, 4)
+        },
+        "peak_rss_mb": round(rss.peak_mb, 1) if rss.peak_mb else round(max_rss_mb(), 1)
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """What the numbers depend on, so result files from different machines are not confused"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import torch
+    settings = sorted(
+        key for key in os.environ
+        if key.split("_")[0] in ("ESG", "OCR", "SUMMARY", "KEY", "GREENWASHING", "EXTRACT", "MODEL")
+    )
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "settings": {key: os.environ[key] for key in settings}
+    }
+
+
+class Suite:
+    def __init__(self, args):
+        self.args = args
+        self.results: List[Dict[str, Any]] = []
+        # Fresh caches so no case is answered from an earlier run of the suite
+        self.cache_dir = tempfile.mkdtemp(prefix="greenstamp-bench-")
+        os.environ["PAGE_CACHE_PATH"] = os.path.join(self.cache_dir, "pages.sqlite3")
+        os.environ["RESULT_CACHE_PATH"] = os.path.join(self.cache_dir, "results.sqlite3")
+        os.environ.setdefault("PRELOAD_MODELS", "0")
+
+        from ai.document_processor import DocumentProcessor
+        self.processor = DocumentProcessor()
+        self._texts: Dict[int, Any] = {}
+
+    def pdf(self, kind: str, pages: int) -> bytes:
+        """A PDF no cache has seen before"""
+        return sample_pdf(pages, seed=pages, nonce=uuid.uuid4().hex, kind=kind)
+
+    def text(self, pages: int):
+        """Extracted text and section index of a native PDF, shared by the model benchmarks"""
+        if pages not in self._texts:
+            from ai.section_segmenter import segment_document
+            page_text = self.processor.extract_text(sample_pdf(pages, seed=pages, kind="native"))
+            self._texts[pages] = (" ".join(page_text.values()), segment_document(page_text, separator=" "))
+        return self._texts[pages]
+
+    def record(self, component: str, case: Dict[str, Any], run: Callable[[int], Any],
+               warmup: Optional[Callable[[], Any]] = None):
+        label = " ".join(f"{key}={value}" for key, value in case.items())
+        print(f"{component:>14}: {label} ...", flush=True)
+        entry = {"component": component, **case}
+        try:
+            if warmup is not None:
+                start = time.perf_counter()
+                warmup()
+                entry["warmup_s"] = round(time.perf_counter() - start, 4)
+            entry.update(measure(run, self.args.repeats, case["pages"]))
+        except Exception as e:
+            print(f"{component:>14}: {label} failed: {str(e)}")
+            entry["error"] = str(e)
+        self.results.append(entry)
+        if "latency_s" in entry:
+            print(f"{'':>14}  p50 {entry['latency_s']['p50']:.3f}s  p95 {entry['latency_s']['p95']:.3f}s  "
+                  f"{entry['throughput']['pages_per_s']:.2f} pages/s  peak {entry['peak_rss_mb']} MB")
+
+    def run_extraction(self):
+        for kind in self.args.kinds:
+            for pages in self.args.pages:
+                pdfs = [self.pdf(kind, pages) for _ in range(self.args.repeats)]
+                self.record("extraction", {"kind": kind, "pages": pages},
+                            lambda repeat: self.processor.extract_text(pdfs[repeat]))
+
+    def run_esg(self):
+        from ai.esg_analyzer import ESGAnalyzer
+        analyzer = ESGAnalyzer()
+        for pages in self.args.pages:
+            text, _ = self.text(pages)
+            self.record("esg", {"kind": "native", "pages": pages},
+                        lambda repeat: analyzer.analyze_text(text),
+                        warmup=lambda: analyzer.analyze_text(text[:2000]))
+
+    def run_greenwashing(self):
+        from ai.greenwashing_detector import GreenwashingDetector
+        detector = GreenwashingDetector()
+        for pages in self.args.pages:
+            text, sections = self.text(pages)
+            self.record("greenwashing", {"kind": "native", "pages": pages, "mode": detector.mode},
+                        lambda repeat: detector.analyze_text(text, sections),
+                        warmup=lambda: detector.analyze_text(text[:2000]))
+
+    def run_summarization(self):
+        from ai.report_summarizer import ReportSummarizer
+        summarizer = ReportSummarizer()
+        mode = summarizer.resolve_mode(self.args.summary_mode)
+        for pages in self.args.pages:
+            text, sections = self.text(pages)
+            self.record("summarization", {"kind": "native", "pages": pages, "mode": mode},
+                        lambda repeat: summarizer.summarize(text, mode, sections),
+                        warmup=lambda: summarizer.summarize(text[:4000], mode))
+
+    def run_end_to_end(self):
+        from fastapi.testclient import TestClient
+        from api.main import MAX_UPLOAD_BYTES, app
+
+        params = {"summary_mode": self.args.summary_mode} if self.args.summary_mode else {}
+        with TestClient(app) as client:
+            def analyze(pdf: bytes):
+                response = client.post("/analyze", params=params,
+                                       files={"file": ("report.pdf", pdf, "application/pdf")})
+                response.raise_for_status()
+                return response.json()
+
+            warmed = False
+            for kind in self.args.kinds:
+                for pages in self.args.pages:
+                    pdfs = [self.pdf(kind, pages) for _ in range(self.args.repeats)]
+                    case = {"kind": kind, "pages": pages}
+                    if max(len(pdf) for pdf in pdfs) > MAX_UPLOAD_BYTES:
+                        print(f"{'end_to_end':>14}: kind={kind} pages={pages} skipped, over the upload limit")
+                        self.results.append({"component": "end_to_end", **case,
+                                             "skipped": "exceeds MAX_UPLOAD_BYTES"})
+                        continue
+                    warmup = None if warmed else (lambda: analyze(self.pdf("native", 2)))
+                    warmed = True
+                    self.record("end_to_end", case, lambda repeat: analyze(pdfs[repeat]), warmup=warmup)
+
+    def run(self) -> Dict[str, Any]:
+        for component in self.args.components:
+            getattr(self, f"run_{component}")()
+        return {
+            "environment": environment(),
+            "config": {
+                "components": list(self.args.components),
+                "kinds": list(self.args.kinds),
+                "pages": list(self.args.pages),
+                "repeats": self.args.repeats,
+                "summary_mode": self.args.summary_mode
+            },
+            "process_peak_rss_mb": round(max_rss_mb(), 1),
+            "results": self.results
+        }
+
+
+def result_key(entry: Dict[str, Any]) -> str:
+    return " ".join(f"{key}={entry[key]}" for key in ("component", "kind", "pages", "mode") if key in entry)
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    """Print p50 latency and peak RSS next to a previous results file"""
+    with open(baseline_path) as f:
+        baseline = {result_key(entry): entry for entry in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for entry in current["results"]:
+        before = baseline.get(result_key(entry))
+        if not before or "latency_s" not in entry or "latency_s" not in before:
+            continue
+        ratio = entry["latency_s"]["p50"] / before["latency_s"]["p50"]
+        print(f"  {result_key(entry):<48} p50 {before['latency_s']['p50']:8.3f}s -> "
+              f"{entry['latency_s']['p50']:8.3f}s ({ratio:5.2f}x)  "
+              f"rss {before['peak_rss_mb']} -> {entry['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--components", nargs="+", default=list(COMPONENTS), choices=COMPONENTS)
+    parser.add_argument("--kinds", nargs="+", default=list(PDF_KINDS), choices=PDF_KINDS)
+    parser.add_argument("--pages", nargs="+", type=int, default=[10, 100, 300])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--summary-mode", choices=["abstractive", "extractive", "hybrid"])
+    parser.add_argument("--quick", action="store_true", help="10-page documents, one repeat")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"))
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+    if args.quick:
+        args.pages, args.repeats = [10], 1
+
+    report = Suite(args).run()
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
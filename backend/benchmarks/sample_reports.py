@@ -0,0 +1,95 @@
+"""Synthetic ESG report corpus shared by the benchmark scripts"""
+
+import os
+import random
+from typing import List, Optional
+
+SENTENCES = [
+    "We reduced scope 1 and scope 2 carbon emissions by 18% against our 2019 baseline.",
+    "Renewable energy now supplies 64% of the electricity used across our manufacturing sites.",
+    "Water usage per unit of production fell for the third consecutive year.",
+    "Our climate change strategy is aligned with the recommendations of the TCFD.",
+    "We remain committed to a sustainable future for all of our stakeholders.",
+    "Greenhouse gases from our logistics fleet increased due to higher shipment volumes.",
+    "Diversity and inclusion targets were set for every business unit in 2023.",
+    "Women hold 41% of senior leadership positions, up from 35% two years ago.",
+    "Our human rights due diligence covered 92% of tier one suppliers.",
+    "Employee welfare programmes were expanded to include mental health support.",
+    "Community engagement projects reached more than 12,000 people in the region.",
+    "Labor practices at two supplier sites were found to be non-compliant and remediated.",
+    "The board composition includes five independent non-executive directors.",
+    "Executive compensation is linked to three sustainability performance indicators.",
+    "Risk management processes were reviewed by the audit committee during the year.",
+    "We maintain a zero tolerance approach to bribery and corruption.",
+    "Transparency in reporting remains a priority for corporate governance.",
+    "Compliance training was completed by 98% of employees.",
+    # Claim-like sentences, some naming the detector's indicator phrases, so the
+    # greenwashing benchmark exercises its classifier rather than only the matcher
+    "Our products are 100% eco-friendly and carbon neutral, with no impact on nature.",
+    "We are fully committed to becoming net zero, although no interim targets have been set.",
+    "Critics describe our green marketing as vague sustainability claims without published data.",
+    "Analysts flagged selective disclosure of emissions from our overseas facilities.",
+    "Our new packaging delivers unsubstantiated environmental benefits according to the regulator.",
+    "Campaigners called the pledge a commitment without action and environmental claims without evidence.",
+]
+
+
+def sample_reports(count: int = 20, min_paragraphs: int = 5, max_paragraphs: int = 60,
+                   seed: int = 0) -> List[str]:
+    """Generate a reproducible corpus of synthetic ESG reports of varying length"""
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(count):
+        paragraphs = []
+        for _ in range(rng.randint(min_paragraphs, max_paragraphs)):
+            paragraphs.append(" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 8))))
+        reports.append("\n\n".join(paragraphs))
+    return reports
+
+
+def load_corpus(corpus_dir: Optional[str] = None, count: int = 20) -> List[str]:
+    """Load .txt reports from a directory, falling back to the synthetic corpus"""
+    if not corpus_dir:
+        return sample_reports(count)
+
+    reports = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+                reports.append(f.read())
+    if not reports:
+        raise ValueError(f"No .txt reports found in {corpus_dir}")
+    return reports[:count]
+
+
+PDF_KINDS = ("native", "scanned", "mixed")
+
+
+def sample_pdf(pages: int = 10, seed: int = 0, nonce: Optional[str] = None, kind: str = "native",
+               scan_dpi: int = 100) -> bytes:
+    """Build a PDF from the synthetic corpus
+
+    kind is "native" (a text layer on every page), "scanned" (every page is
+    an image, so extraction needs OCR) or "mixed" (every other page scanned).
+    A nonce in the document metadata gives each PDF a distinct hash so
+    benchmarks are not answered from the result or page caches.
+    """
+    import fitz  # PyMuPDF
+
+    if kind not in PDF_KINDS:
+        raise ValueError(f"Unknown PDF kind '{kind}', expected one of {PDF_KINDS}")
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        text = " ".join(rng.choice(SENTENCES) for _ in range(30))
+        page.insert_textbox(fitz.Rect(56, 56, page.rect.width - 56, page.rect.height - 56), text, fontsize=10)
+        if kind == "scanned" or (kind == "mixed" and number % 2 == 1):
+            # Replace the text layer with a greyscale raster of the same page
+            pixmap = page.get_pixmap(dpi=scan_dpi, colorspace=fitz.csGRAY)
+            doc.delete_page(number)
+            page = doc.new_page(pno=number)
+            page.insert_image(page.rect, pixmap=pixmap)
+    if nonce:
+        doc.set_metadata({"subject": nonce})
+    return doc.tobytes(deflate=True)
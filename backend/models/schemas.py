@@ -20,6 +20,16 @@ class GreenwashingWarning(BaseModel):
     confidence: float
     severity: str
     text_snippet: Optional[str] = None
+    offset: Optional[int] = None
+    section: Optional[str] = None
+
+class ReportSection(BaseModel):
+    """Heading-delimited section of the report mapped to an ESG category"""
+    title: str
+    category: Optional[str] = None
+    start: int
+    end: int
+    page: int
 
 class ReportSummary(BaseModel):
     """Summary of the ESG report"""
@@ -33,7 +43,9 @@ class ESGAnalysisResult(BaseModel):
     scores: Dict[str, float]
     category_details: Dict[str, Dict[str, float]]
     greenwashing_warnings: List[GreenwashingWarning]
+    greenwashing_risk_score: float = 0.0
     summary: Dict[str, str]
+    sections: List[ReportSection] = []
     text_excerpt: str
     metadata: Dict[str, str]
 
@@ -0,0 +1,35 @@
+"""Tests for the SQLite-backed LRU cache"""
+
+from ai.disk_cache import DiskLRUCache
+
+
+def test_running_total_tracks_puts_and_replacements(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 50)
+    cache.put("a", "z" * 10)
+    assert cache.get("a") == "z" * 10
+    assert cache._total == cache.stats()["bytes"] == len('"' + "z" * 10 + '"') + len('"' + "y" * 50 + '"')
+
+
+def test_eviction_keeps_recently_read_entries(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache.sqlite3"), max_bytes=250, touch_batch=64)
+    cache.put("old", "a" * 100)
+    cache.put("new", "b" * 100)
+    # The hit is only recorded in memory until the next put writes it back
+    assert cache.get("old") == "a" * 100
+    cache.put("third", "c" * 100)
+    assert cache.get("new") is None
+    assert cache.get("old") == "a" * 100
+    assert cache.get("third") == "c" * 100
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= 250
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_total_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    DiskLRUCache(path, max_bytes=1000).put("a", [1, 2, 3])
+    reopened = DiskLRUCache(path, max_bytes=1000)
+    assert reopened._total == len("[1, 2, 3]")
+    assert reopened.get("a") == [1, 2, 3]
@@ -0,0 +1,68 @@
+"""Tests for the Aho-Corasick phrase matcher; run from the backend directory with `python -m pytest tests`"""
+
+import threading
+
+from ai.phrase_matcher import PhraseMatch, PhraseMatcher
+
+
+def spans(matches):
+    return [(m.phrase, m.start, m.end) for m in matches]
+
+
+def test_overlapping_phrases_are_all_reported():
+    matcher = PhraseMatcher({"change": "a", "climate change": "b", "climate": "c"})
+    text = "Climate change matters."
+    assert spans(matcher.find_all(text)) == [
+        ("climate change", 0, 14),
+        ("climate", 0, 7),
+        ("change", 8, 14),
+    ]
+
+
+def test_matches_carry_labels_and_original_offsets():
+    matcher = PhraseMatcher({"net zero": "environmental"})
+    text = "We target NET ZERO by 2040."
+    assert matcher.find_all(text) == [PhraseMatch("net zero", "environmental", 10, 18)]
+    assert text[10:18] == "NET ZERO"
+
+
+def test_matches_respect_word_boundaries():
+    matcher = PhraseMatcher({"compliance": None, "risk": None})
+    text = "noncompliance, compliances, risky; compliance and risk_free but risk."
+    assert spans(matcher.find_all(text)) == [("compliance", 35, 45), ("risk", 64, 68)]
+
+
+def test_add_after_matching_does_not_duplicate_matches():
+    matcher = PhraseMatcher({"change": "a", "climate change": "b"})
+    text = "climate change now"
+    expected = [("climate change", 0, 14), ("change", 8, 14)]
+    assert spans(matcher.find_all(text)) == expected
+
+    matcher.add("now")
+    assert spans(matcher.find_all(text)) == expected + [("now", 15, 18)]
+
+    matcher.add("climate")
+    assert spans(matcher.find_all(text)) == [("climate change", 0, 14), ("climate", 0, 7)] + expected[1:] + [
+        ("now", 15, 18)
+    ]
+
+
+def test_found_groups_distinct_phrases_by_label():
+    matcher = PhraseMatcher()
+    matcher.add_many(["diversity", "human rights"], "social")
+    matcher.add_many(["transparency"], "governance")
+    found = matcher.found("Diversity, diversity and transparency.")
+    assert found == {"social": ["diversity"], "governance": ["transparency"]}
+
+
+def test_concurrent_first_matches_agree():
+    matcher = PhraseMatcher({"carbon": None, "carbon emissions": None})
+    matcher.add("emissions")
+    text = "carbon emissions fell"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(spans(matcher.find_all(text)))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[("carbon emissions", 0, 16), ("carbon", 0, 6), ("emissions", 7, 16)]] * 8
@@ -0,0 +1,44 @@
+"""Tests for heading detection and section segmentation"""
+
+import pytest
+
+from ai.section_segmenter import is_heading, segment_text
+
+
+@pytest.mark.parametrize("line", [
+    "1. Climate Strategy",
+    "2) Our people",
+    "3.2 Water stewardship",
+    "4.1.3. Board oversight",
+    "IV. Governance",
+    "ENVIRONMENTAL PERFORMANCE",
+    "Health and Safety",
+])
+def test_headings_are_detected(line):
+    assert is_heading(line)
+
+
+@pytest.mark.parametrize("line", [
+    "I am proud to present this year",
+    "10 sites were certified during the year",
+    "2019 baseline and reached 64% renewable",
+    "3 new suppliers joined the programme",
+    "1. reduce emissions across operations",
+])
+def test_numbered_body_lines_are_not_headings(line):
+    assert not is_heading(line)
+
+
+def test_body_lines_do_not_split_sections():
+    text = (
+        "1. Climate Strategy\n"
+        "We cut emissions again.\n"
+        "2019 baseline and reached 64% renewable\n"
+        "energy across our carbon footprint.\n"
+        "2. Our People\n"
+        "Employees joined diversity programmes.\n"
+    )
+    sections = segment_text(text).sections
+    titles = [section.title for section in sections if section.title]
+    assert titles == ["1. Climate Strategy", "2. Our People"]
+    assert [s.category for s in sections if s.title] == ["environmental", "social"]